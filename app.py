@@ -5,13 +5,13 @@ Premium Apple-Style UI + Attention Required Tab + Quality AI
 
 import streamlit as st
 import pandas as pd
-import plotly.graph_objects as go
+import numpy as np
 from datetime import datetime
+from functools import lru_cache
 import io
 
 from modules.parsers import broker_parser
 from modules.analysis import discipline_scorer
-from modules.ai import groq_insights
 
 # Page config
 st.set_page_config(
@@ -21,20 +21,15 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Hide Streamlit branding
-hide_st_style = """
-<style>
-#MainMenu {visibility: hidden;}
-footer {visibility: hidden;}
-header {visibility: hidden;}
-.stDeployButton {visibility: hidden;}
-</style>
-"""
-st.markdown(hide_st_style, unsafe_allow_html=True)
-
-# Premium Apple-Style UI
-st.markdown("""
+# Single stylesheet: Streamlit branding hidden + premium Apple-style UI
+APP_CSS = """
 <style>
+    /* Hide Streamlit branding */
+    #MainMenu {visibility: hidden;}
+    footer {visibility: hidden;}
+    header {visibility: hidden;}
+    .stDeployButton {visibility: hidden;}
+    
     /* Apple-inspired minimalist design */
     .stApp {
         background: #000000;
@@ -176,18 +171,24 @@ st.markdown("""
         border-radius: 8px;
     }
 </style>
-""", unsafe_allow_html=True)
+"""
+# st.html (not markdown): no markdown parsing, and style-only HTML takes no layout space
+st.html(APP_CSS)
 
 
 def main():
     """Main application"""
     
-    if 'trades_df' not in st.session_state:
-        st.session_state.trades_df = None
+    if 'trades_blob' not in st.session_state:
+        st.session_state.trades_blob = None
+    if 'export_blob' not in st.session_state:
+        st.session_state.export_blob = None
     if 'stats' not in st.session_state:
         st.session_state.stats = None
     if 'attention_df' not in st.session_state:
         st.session_state.attention_df = None
+    if 'recent_trades' not in st.session_state:
+        st.session_state.recent_trades = None
     
     # Header
     st.title("📊 TradeAudit Pro")
@@ -216,28 +217,35 @@ def main():
         
         st.divider()
         
-        st.header("⚙️ API Settings")
-        with st.expander("🔑 Update Keys"):
-            new_groq_key = st.text_input("Groq API Key", type="password")
-            if st.button("Update"):
-                st.success("✅ Updated!")
+        show_api_settings()
         
         st.divider()
         st.caption("🔒 Privacy Protected")
-        st.caption("No data stored • Session only")
+        # Keep in step with groq_insights.INSIGHT_CACHE_EXPIRE
+        st.caption("Trades stay in your session • Per-trade AI insights cached on the server for 7 days")
     
     # Main content
-    if st.session_state.trades_df is not None:
+    if st.session_state.trades_blob is not None:
         show_dashboard()
     else:
         show_welcome_screen()
 
 
+@st.fragment
+def show_api_settings():
+    """API key settings (fragment: key edits don't rerun the whole app)"""
+    st.header("⚙️ API Settings")
+    with st.expander("🔑 Update Keys"):
+        new_groq_key = st.text_input("Groq API Key", type="password")
+        if st.button("Update"):
+            st.success("✅ Updated!")
+
+
 def process_file(uploaded_file, trade_type):
     """Process uploaded file with attention tracking"""
     try:
-        # Parse file - now returns 3 values
-        trades_df, attention_df, error = broker_parser.parse_broker_file(uploaded_file, trade_type)
+        # Parse + score - cached on the uploaded file's content
+        trades_df, export_blob, attention_df, stats, error = _parse_and_score(uploaded_file.getvalue(), trade_type)
         
         if error:
             st.error(f"❌ {error}")
@@ -246,17 +254,12 @@ def process_file(uploaded_file, trade_type):
         if trades_df is None or len(trades_df) == 0:
             st.warning("⚠️ No valid trades found. Check 'Attention Required' tab.")
         
-        # Calculate scores
-        if trades_df is not None and len(trades_df) > 0:
-            trades_df = discipline_scorer.calculate_discipline_scores(trades_df)
-            stats = discipline_scorer.calculate_portfolio_stats(trades_df)
-        else:
-            stats = {}
-        
-        # Store in session
-        st.session_state.trades_df = trades_df
+        # Store in session - trades as a compact Parquet blob, not a live frame
+        st.session_state.trades_blob = _to_parquet(trades_df if trades_df is not None else pd.DataFrame())
+        st.session_state.export_blob = export_blob
         st.session_state.stats = stats
         st.session_state.attention_df = attention_df
+        st.session_state.recent_trades = _recent_trades(trades_df) if trades_df is not None and len(trades_df) > 0 else None
         
         if trades_df is not None and len(trades_df) > 0:
             st.success(f"✅ Processed {len(trades_df)} valid trades!")
@@ -269,6 +272,121 @@ def process_file(uploaded_file, trade_type):
         st.error(f"❌ Error: {str(e)}")
 
 
+@st.cache_data(show_spinner=False, max_entries=4)
+def _parse_and_score(file_bytes, trade_type):
+    """
+    Parse, score and summarise a tradebook
+    
+    Cached on file content, so re-analysing the same upload skips the pipeline.
+    
+    Returns:
+        tuple: (trades_df, export_blob, attention_df, stats, error_message) -
+        export_blob is the full scored tradebook as Parquet, for downloads
+    """
+    # Parse file - returns 3 values
+    trades_df, attention_df, error = broker_parser.parse_broker_file(file_bytes, trade_type)
+    
+    if error:
+        return None, None, None, {}, error
+    
+    # Calculate scores
+    if trades_df is not None and len(trades_df) > 0:
+        trades_df = discipline_scorer.calculate_discipline_scores(trades_df)
+        stats = discipline_scorer.calculate_portfolio_stats(trades_df)
+        # Downloads keep every column; only the analysis working set is trimmed
+        export_blob = _to_parquet(trades_df)
+        # Stats have consumed the charge breakdown - carry only what the tabs use
+        trades_df = trades_df.loc[:, [c for c in ANALYSIS_COLUMNS if c in trades_df.columns]]
+        trades_df = _downcast_trades(trades_df)
+    else:
+        stats = {}
+        export_blob = None
+    
+    return trades_df, export_blob, attention_df, stats, None
+
+
+# Columns the dashboard, AI and patterns tabs work from (the export keeps the full tradebook)
+ANALYSIS_COLUMNS = ['entry_date', 'entry_time', 'exit_time', 'symbol', 'direction', 'quantity',
+                    'entry_price', 'exit_price', 'net_pnl', 'return_pct', 'total_charges',
+                    'discipline_score', 'grade', 'win', 'holding_period_minutes']
+
+
+# Fixed category sets: filters compare int codes, and dtypes are stable across uploads
+DIRECTION_DTYPE = pd.CategoricalDtype(['LONG', 'SHORT'])
+GRADE_DTYPE = pd.CategoricalDtype(['A+', 'A', 'B', 'C', 'D', 'F'])
+
+
+def _downcast_trades(trades_df):
+    """
+    Shrink dtypes of the scored frame (stats are computed before this)
+    
+    Only integer, bool and categorical columns are narrowed; rupee amounts
+    stay float64, since float32 loses paise in the tables and exports.
+    """
+    trades_df['grade'] = trades_df['grade'].astype(GRADE_DTYPE)
+    if 'direction' in trades_df.columns:
+        trades_df['direction'] = trades_df['direction'].astype(DIRECTION_DTYPE)
+    trades_df['symbol'] = trades_df['symbol'].astype('category')
+    
+    trades_df['win'] = trades_df['win'].astype(bool)
+    for col in ('quantity', 'holding_period_minutes'):
+        trades_df[col] = pd.to_numeric(trades_df[col], downcast='integer')
+    
+    trades_df['discipline_score'] = trades_df['discipline_score'].astype('int16')
+    
+    return trades_df
+
+
+def _recent_trades(trades_df, n=5):
+    """Latest n trades by entry time, newest first (O(n) partial selection)"""
+    # entry_time is datetime64 (entry_date holds date objects); NaT sorts lowest
+    times = trades_df['entry_time'].to_numpy().view('i8')
+    k = min(n, len(times))
+    idx = np.argpartition(times, len(times) - k)[len(times) - k:]
+    idx = idx[np.argsort(times[idx], kind='stable')[::-1]]
+    return trades_df.iloc[idx][['entry_date', 'entry_time', *INSIGHT_FIELDS]]
+
+
+def _to_parquet(trades_df):
+    """Serialize the trades frame for session storage (zstd, dtypes preserved)"""
+    buffer = io.BytesIO()
+    trades_df.to_parquet(buffer, engine='pyarrow', compression='zstd')
+    return buffer.getvalue()
+
+
+# Process-wide caches keyed per session's blob: room for this many concurrent sessions
+SESSION_CACHE_ENTRIES = 32
+
+
+@st.cache_resource(show_spinner=False, max_entries=SESSION_CACHE_ENTRIES)
+def _load_trades(blob):
+    """
+    Trades frame from its session-state Parquet blob
+    
+    cache_resource hands back the same frame instead of unpickling a copy on
+    every rerun; callers must treat it as read-only.
+    """
+    return pd.read_parquet(io.BytesIO(blob))
+
+
+def _hash_frame(df):
+    """Content hash for DataFrame arguments of cached chart helpers"""
+    return pd.util.hash_pandas_object(df, index=True).values.tobytes()
+
+
+@st.cache_data(show_spinner=False, hash_funcs={pd.DataFrame: _hash_frame})
+def _dashboard_data(trades_df):
+    """
+    Shared chart inputs, computed once per trades frame
+    
+    Returns:
+        tuple: (trades sorted by entry_date, net P&L per symbol)
+    """
+    sorted_df = trades_df.sort_values('entry_date', kind='stable').reset_index(drop=True)
+    symbol_pnl = trades_df.groupby('symbol', sort=False, observed=True)['net_pnl'].sum()
+    return sorted_df, symbol_pnl
+
+
 def show_welcome_screen():
     """Premium welcome screen"""
     
@@ -316,8 +434,9 @@ def show_welcome_screen():
         <div class='metric-card'>
             <h3>🔒 Privacy First</h3>
             <p style='color: rgba(255,255,255,0.7);'>
-            • No data storage<br/>
+            • Tradebook never written to disk<br/>
             • Session-only processing<br/>
+            • Per-trade AI insights cached 7 days<br/>
             • Export capability<br/>
             • DPDP compliant
             </p>
@@ -330,10 +449,16 @@ def show_welcome_screen():
 def show_dashboard():
     """Main dashboard with all tabs"""
     
-    trades_df = st.session_state.trades_df
+    trades_df = _load_trades(st.session_state.trades_blob)
     stats = st.session_state.stats
     attention_df = st.session_state.attention_df
     
+    # Chart data - sorted/aggregated once, shared across tabs
+    if len(trades_df) > 0:
+        sorted_df, symbol_pnl = _dashboard_data(trades_df)
+    else:
+        sorted_df, symbol_pnl = trades_df, None
+    
     # Create tabs
     tab_names = ["📊 Dashboard", "📋 Trade Details", "🤖 AI Insights", "📈 Patterns", "💾 Export"]
     
@@ -346,7 +471,7 @@ def show_dashboard():
     
     # Dashboard
     with tabs[tab_idx]:
-        show_dashboard_tab(trades_df, stats)
+        show_dashboard_tab(sorted_df, stats)
     tab_idx += 1
     
     # Trade Details
@@ -362,21 +487,22 @@ def show_dashboard():
     
     # AI Insights
     with tabs[tab_idx]:
-        show_ai_insights_tab(trades_df, stats)
+        show_ai_insights_tab(trades_df, stats, symbol_pnl)
     tab_idx += 1
     
     # Patterns
     with tabs[tab_idx]:
-        show_patterns_tab(trades_df)
+        show_patterns_tab(sorted_df, stats)
     tab_idx += 1
     
-    # Export
+    # Export - full tradebook, decoded only when a download is built
     with tabs[tab_idx]:
-        show_export_tab(trades_df)
+        show_export_tab(st.session_state.export_blob)
 
 
+@st.fragment
 def show_dashboard_tab(trades_df, stats):
-    """Dashboard with key metrics"""
+    """Dashboard with key metrics (trades_df sorted by entry_date)"""
     
     if trades_df is None or len(trades_df) == 0:
         st.warning("No valid trades to display")
@@ -422,13 +548,15 @@ def show_dashboard_tab(trades_df, stats):
     
     with col1:
         st.subheader("Cumulative P&L")
-        plot_cumulative_pnl(trades_df)
+        # Charts hash their input - pass only the columns they plot
+        plot_cumulative_pnl(trades_df[['entry_date', 'net_pnl']])
     
     with col2:
         st.subheader("P&L Distribution")
-        plot_pnl_dist(trades_df)
+        plot_pnl_dist(trades_df[['net_pnl', 'win']])
 
 
+@st.fragment
 def show_trade_details_tab(trades_df):
     """Trade details table"""
     
@@ -446,37 +574,39 @@ def show_trade_details_tab(trades_df):
     
     with col2:
         if 'direction' in trades_df.columns:
-            direction_filter = st.selectbox("Direction", ["All", "LONG", "SHORT"])
+            direction_filter = st.selectbox("Direction", ["All", *DIRECTION_DTYPE.categories])
         else:
             direction_filter = "All"
     
     with col3:
-        grade_filter = st.selectbox("Grade", ["All", "A+", "A", "B", "C", "D", "F"])
+        grade_filter = st.selectbox("Grade", ["All", *GRADE_DTYPE.categories])
     
-    # Apply filters
-    filtered_df = trades_df.copy()
+    # Apply filters - one combined mask, one slice (no copy of the full frame)
+    mask = np.ones(len(trades_df), dtype=bool)
     
     if result_filter == "Wins":
-        filtered_df = filtered_df[filtered_df['win'] == True]
+        mask &= trades_df['win'].to_numpy(dtype=bool)
     elif result_filter == "Losses":
-        filtered_df = filtered_df[filtered_df['win'] == False]
+        mask &= ~trades_df['win'].to_numpy(dtype=bool)
     
-    if direction_filter != "All" and 'direction' in filtered_df.columns:
-        filtered_df = filtered_df[filtered_df['direction'] == direction_filter]
+    if direction_filter != "All" and 'direction' in trades_df.columns:
+        mask &= (trades_df['direction'] == direction_filter).to_numpy()
     
     if grade_filter != "All":
-        filtered_df = filtered_df[filtered_df['grade'] == grade_filter]
-    
-    st.caption(f"Showing {len(filtered_df)} of {len(trades_df)} trades")
+        mask &= (trades_df['grade'] == grade_filter).to_numpy()
     
     # Display
     display_cols = ['entry_date', 'symbol', 'quantity', 'entry_price', 'exit_price', 
                    'net_pnl', 'return_pct', 'discipline_score', 'grade']
     
-    if 'direction' in filtered_df.columns:
+    if 'direction' in trades_df.columns:
         display_cols.insert(2, 'direction')
     
-    st.dataframe(filtered_df[display_cols], use_container_width=True, height=600)
+    filtered_df = trades_df.loc[mask, display_cols]
+    
+    st.caption(f"Showing {len(filtered_df)} of {len(trades_df)} trades")
+    
+    st.dataframe(filtered_df, use_container_width=True, height=600)
 
 
 def show_attention_tab(attention_df):
@@ -485,19 +615,25 @@ def show_attention_tab(attention_df):
     st.header("⚠️ Attention Required")
     st.write("The following symbols were **excluded** from analysis due to quantity mismatches:")
     
-    for idx, row in attention_df.iterrows():
-        st.markdown(f"""
+    # All cards in one markdown element
+    rows = attention_df[['symbol', 'status', 'difference', 'buy_qty', 'sell_qty', 'message']].itertuples(index=False)
+    cards = "\n".join(
+        f"""
         <div class='metric-card' style='border-left: 4px solid #FF9F0A;'>
-            <h3>🔴 {row['symbol']}</h3>
-            <p><strong>Status:</strong> {row['status']} ({abs(row['difference']):.0f} units unmatched)</p>
-            <p><strong>Buy Quantity:</strong> {row['buy_qty']:.0f} | <strong>Sell Quantity:</strong> {row['sell_qty']:.0f}</p>
-            <p><strong>Reason:</strong> {row['message']}</p>
+            <h3>🔴 {row.symbol}</h3>
+            <p><strong>Status:</strong> {row.status} ({abs(row.difference):.0f} units unmatched)</p>
+            <p><strong>Buy Quantity:</strong> {row.buy_qty:.0f} | <strong>Sell Quantity:</strong> {row.sell_qty:.0f}</p>
+            <p><strong>Reason:</strong> {row.message}</p>
             <p style='color: #0A84FF;'><strong>💡 Action:</strong> Review if this is a carry-forward position or update date range to include missing trades.</p>
         </div>
-        """, unsafe_allow_html=True)
+        """
+        for row in rows
+    )
+    st.markdown(cards, unsafe_allow_html=True)
 
 
-def show_ai_insights_tab(trades_df, stats):
+@st.fragment
+def show_ai_insights_tab(trades_df, stats, symbol_pnl=None):
     """AI insights with premium quality"""
     
     if trades_df is None or len(trades_df) == 0:
@@ -507,6 +643,8 @@ def show_ai_insights_tab(trades_df, stats):
     st.header("AI-Powered Insights")
     
     try:
+        from modules.ai import groq_insights
+        
         groq_gen = groq_insights.get_groq_generator()
         success, msg = groq_gen.connect()
         
@@ -517,31 +655,50 @@ def show_ai_insights_tab(trades_df, stats):
         
         # Portfolio summary
         st.subheader("Portfolio Analysis")
-        with st.spinner("Analyzing..."):
-            summary = groq_gen.generate_portfolio_summary(stats, trades_df)
-            if summary:
-                st.markdown(f"""
-                <div class='metric-card'>
-                {summary}
-                </div>
-                """, unsafe_allow_html=True)
+        # Streamed into the card as tokens arrive
+        summary_card = st.empty()
+        summary = ""
+        for chunk in groq_gen.stream_portfolio_summary(stats, trades_df, symbol_pnl):
+            summary += chunk
+            summary_card.markdown(f"""
+            <div class='metric-card'>
+            {summary}
+            </div>
+            """, unsafe_allow_html=True)
         
         st.divider()
         
         # Recent trades
         st.subheader("Recent Trades Analysis")
-        recent_trades = trades_df.sort_values('entry_date', ascending=False).head(5)
+        recent_trades = st.session_state.get('recent_trades')
+        if recent_trades is None:
+            recent_trades = _recent_trades(trades_df)
+        records = recent_trades.to_dict('records')
+        
+        # One batched request for all recent trades
+        trade_data = [{f: trade[f] for f in INSIGHT_FIELDS} for trade in records]
+        
+        with st.spinner("Analyzing trades..."):
+            insights = groq_gen.generate_trade_insights_batch(trade_data)
         
-        for idx, trade in recent_trades.iterrows():
+        for trade, insight in zip(records, insights):
             with st.expander(f"{trade['symbol']} - {trade['entry_date']} - ₹{trade['net_pnl']:,.0f}"):
-                insight = groq_gen.generate_trade_insight(trade.to_dict())
                 st.write(insight)
         
     except Exception as e:
         st.error(f"❌ {str(e)}")
 
 
-def show_patterns_tab(trades_df):
+# Trade fields used by the insight prompt
+INSIGHT_FIELDS = ('symbol', 'direction', 'entry_price', 'exit_price', 'quantity',
+                  'net_pnl', 'return_pct', 'holding_period_minutes', 'total_charges')
+
+
+SEVERITY_COLORS = {'high': '#FF453A', 'medium': '#FF9F0A', 'low': '#0A84FF'}
+
+
+@st.fragment
+def show_patterns_tab(trades_df, stats=None):
     """Behavioral patterns"""
     
     if trades_df is None or len(trades_df) == 0:
@@ -550,27 +707,36 @@ def show_patterns_tab(trades_df):
     
     st.header("Behavioral Patterns")
     
-    patterns = discipline_scorer.detect_behavioral_patterns(trades_df)
+    patterns = _behavioral_patterns(trades_df, stats)
     
     if len(patterns) == 0:
         st.success("✅ No major issues detected!")
     else:
-        for pattern in patterns:
-            color = {'high': '#FF453A', 'medium': '#FF9F0A', 'low': '#0A84FF'}[pattern['severity']]
-            
-            st.markdown(f"""
-            <div class='metric-card' style='border-left: 4px solid {color}'>
+        # All cards in one markdown element
+        cards = "\n".join(
+            f"""
+            <div class='metric-card' style='border-left: 4px solid {SEVERITY_COLORS[pattern['severity']]}'>
                 <h3>⚠️ {pattern['pattern']}</h3>
                 <p>{pattern['description']}</p>
                 <p style='color: #30D158;'><strong>💡 Recommendation:</strong> {pattern['recommendation']}</p>
             </div>
-            """, unsafe_allow_html=True)
+            """
+            for pattern in patterns
+        )
+        st.markdown(cards, unsafe_allow_html=True)
 
 
-def show_export_tab(trades_df):
-    """Export functionality"""
+@st.cache_data(show_spinner=False, hash_funcs={pd.DataFrame: _hash_frame})
+def _behavioral_patterns(trades_df, stats=None):
+    """Behavioral patterns, cached on the trades' content (stats: the session's portfolio stats)"""
+    return discipline_scorer.detect_behavioral_patterns(trades_df, stats)
+
+
+@st.fragment
+def show_export_tab(export_blob):
+    """Export functionality (export_blob: the full tradebook as Parquet)"""
     
-    if trades_df is None or len(trades_df) == 0:
+    if export_blob is None:
         st.warning("No trades to export")
         return
     
@@ -580,76 +746,170 @@ def show_export_tab(trades_df):
     col1, col2 = st.columns(2)
     
     with col1:
-        csv = trades_df.to_csv(index=False)
         st.download_button(
             "📥 Download CSV",
-            csv,
+            _csv_bytes(export_blob),
             f"tradeaudit_{datetime.now().strftime('%Y%m%d')}.csv",
             "text/csv",
             use_container_width=True
         )
     
     with col2:
-        buffer = io.BytesIO()
-        with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
-            trades_df.to_excel(writer, sheet_name='Trades', index=False)
-        
         st.download_button(
             "📥 Download Excel",
-            buffer.getvalue(),
+            _excel_bytes(export_blob),
             f"tradeaudit_{datetime.now().strftime('%Y%m%d')}.xlsx",
             "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
             use_container_width=True
         )
 
 
-def plot_cumulative_pnl(trades_df):
-    """Cumulative P&L chart"""
-    df = trades_df.sort_values('entry_date')
-    df['cumulative_pnl'] = df['net_pnl'].cumsum()
+@st.cache_data(show_spinner=False, max_entries=SESSION_CACHE_ENTRIES)
+def _csv_bytes(export_blob):
+    """
+    CSV export, built once per tradebook blob (decoded only on a cache miss)
+    
+    Written with to_csv, not PyArrow's writer: Arrow quotes every string,
+    prints 10.0 as 10 and lowercases booleans, so the file would differ from
+    what users have always downloaded.
+    """
+    return pd.read_parquet(io.BytesIO(export_blob)).to_csv(index=False).encode()
+
+
+@st.cache_data(show_spinner=False, max_entries=SESSION_CACHE_ENTRIES)
+def _excel_bytes(export_blob):
+    """Excel export, built once per tradebook blob (xlsxwriter when installed)"""
+    try:
+        import xlsxwriter
+        engine = 'xlsxwriter'
+    except ImportError:
+        engine = 'openpyxl'
+    
+    buffer = io.BytesIO()
+    with pd.ExcelWriter(buffer, engine=engine) as writer:
+        pd.read_parquet(io.BytesIO(export_blob)).to_excel(writer, sheet_name='Trades', index=False)
+    return buffer.getvalue()
+
+
+@lru_cache(maxsize=1)
+def _get_plotly():
+    """plotly.graph_objects, imported on first chart render"""
+    import plotly.graph_objects as go
+    return go
+
+
+# Shared dark layout for all charts (per-chart axes/bar settings are added on top)
+CHART_LAYOUT = dict(
+    plot_bgcolor='rgba(0,0,0,0)',
+    paper_bgcolor='rgba(0,0,0,0)',
+    font=dict(color='white'),
+    height=350,
+    margin=dict(l=0, r=0, t=0, b=0)
+)
+
+# Above this many trades charts are static (no client-side hover/zoom hit-testing)
+STATIC_PLOT_MIN_TRADES = 50_000
+
+
+def _chart_config(df):
+    """Plotly config for a chart built from df"""
+    return {'staticPlot': len(df) > STATIC_PLOT_MIN_TRADES}
+
+
+@lru_cache(maxsize=1)
+def _get_datashader():
+    """(datashader, transfer_functions), or None when datashader is not installed"""
+    try:
+        import datashader as ds
+        import datashader.transfer_functions as tf
+    except ImportError:
+        return None
+    return ds, tf
+
+
+# Above this many trades the cumulative line is rasterized server-side
+RASTER_MIN_TRADES = 10_000
+
+
+def plot_cumulative_pnl(sorted_df):
+    """Cumulative P&L chart (expects trades sorted by entry_date)"""
+    if len(sorted_df) > RASTER_MIN_TRADES and _get_datashader() is not None:
+        st.image(_cumulative_pnl_raster(sorted_df))
+        return
     
-    fig = go.Figure()
-    fig.add_trace(go.Scatter(
-        x=df['entry_date'],
-        y=df['cumulative_pnl'],
+    st.plotly_chart(_cumulative_pnl_figure(sorted_df), use_container_width=True, config=_chart_config(sorted_df))
+
+
+@st.cache_data(show_spinner=False, hash_funcs={pd.DataFrame: _hash_frame})
+def _cumulative_pnl_raster(sorted_df):
+    """Cumulative P&L rendered by Datashader to a fixed-size image"""
+    ds, tf = _get_datashader()
+    dates = np.asarray(sorted_df['entry_date'].to_numpy(), dtype='datetime64[D]')
+    line = pd.DataFrame({
+        'x': dates.astype(np.int64).astype(np.float64),
+        'y': np.cumsum(sorted_df['net_pnl'].to_numpy(), dtype=np.float64),
+    })
+    
+    canvas = ds.Canvas(plot_width=800, plot_height=350)
+    agg = canvas.line(line, 'x', 'y')
+    return tf.shade(agg, cmap=['#0A84FF']).to_pil()
+
+
+@st.cache_data(show_spinner=False, hash_funcs={pd.DataFrame: _hash_frame})
+def _cumulative_pnl_figure(sorted_df):
+    """Cumulative P&L figure, cached on the trades' content"""
+    go = _get_plotly()
+    dates = sorted_df['entry_date'].to_numpy()
+    cumulative_pnl = np.cumsum(sorted_df['net_pnl'].to_numpy(), dtype=np.float64)
+    
+    # WebGL trace; area fill is tessellated on the CPU, so drop it for large books
+    fill = 'tozeroy' if len(dates) <= 5000 else 'none'
+    
+    fig = go.Figure(layout=CHART_LAYOUT)
+    fig.add_trace(go.Scattergl(
+        x=dates,
+        y=cumulative_pnl,
         mode='lines',
-        fill='tozeroy',
-        line=dict(color='#0A84FF', width=3),
+        fill=fill,
+        line=dict(color='#0A84FF', width=3, shape='linear'),
         fillcolor='rgba(10, 132, 255, 0.1)'
     ))
     
     fig.update_layout(
-        plot_bgcolor='rgba(0,0,0,0)',
-        paper_bgcolor='rgba(0,0,0,0)',
-        font=dict(color='white'),
         xaxis=dict(showgrid=False),
-        yaxis=dict(showgrid=True, gridcolor='rgba(255,255,255,0.1)'),
-        height=350,
-        margin=dict(l=0, r=0, t=0, b=0)
+        yaxis=dict(showgrid=True, gridcolor='rgba(255,255,255,0.1)')
     )
     
-    st.plotly_chart(fig, use_container_width=True)
+    return fig
 
 
 def plot_pnl_dist(trades_df):
     """P&L distribution"""
-    wins = trades_df[trades_df['win'] == True]['net_pnl']
-    losses = trades_df[trades_df['win'] == False]['net_pnl']
-    
-    fig = go.Figure()
-    fig.add_trace(go.Histogram(x=wins, name='Wins', marker_color='#30D158', opacity=0.7))
-    fig.add_trace(go.Histogram(x=losses, name='Losses', marker_color='#FF453A', opacity=0.7))
-    
-    fig.update_layout(
-        barmode='overlay',
-        plot_bgcolor='rgba(0,0,0,0)',
-        paper_bgcolor='rgba(0,0,0,0)',
-        font=dict(color='white'),
-        height=350,
-        margin=dict(l=0, r=0, t=0, b=0)
-    )
-    
-    st.plotly_chart(fig, use_container_width=True)
+    st.plotly_chart(_pnl_dist_figure(trades_df), use_container_width=True, config=_chart_config(trades_df))
+
+
+@st.cache_data(show_spinner=False, hash_funcs={pd.DataFrame: _hash_frame})
+def _pnl_dist_figure(trades_df):
+    """P&L distribution figure, cached on the trades' content"""
+    go = _get_plotly()
+    pnl = trades_df['net_pnl'].to_numpy()
+    win_mask = trades_df['win'].to_numpy(dtype=bool)
+    valid = np.isfinite(pnl)
+    pnl, win_mask = pnl[valid], win_mask[valid]
+    
+    # Bin on the server with shared edges - the browser gets bar heights, not every trade
+    edges = np.histogram_bin_edges(pnl, bins=60)
+    centers = (edges[:-1] + edges[1:]) / 2
+    win_counts, _ = np.histogram(pnl[win_mask], bins=edges)
+    loss_counts, _ = np.histogram(pnl[~win_mask], bins=edges)
+    
+    fig = go.Figure(layout=CHART_LAYOUT)
+    fig.add_trace(go.Bar(x=centers, y=win_counts, name='Wins', marker_color='#30D158', opacity=0.7))
+    fig.add_trace(go.Bar(x=centers, y=loss_counts, name='Losses', marker_color='#FF453A', opacity=0.7))
+    
+    fig.update_layout(barmode='overlay', bargap=0)
+    
+    return fig
 
 
 if __name__ == "__main__":
@@ -4,136 +4,270 @@ High-quality, actionable insights with specific data and recommendations
 """
 
 import streamlit as st
+import asyncio
+import hashlib
 import json
+import threading
+import time
+from functools import lru_cache
 
 try:
-    from groq import Groq
-    GROQ_AVAILABLE = True
+    import diskcache as dc
+    from pathlib import Path
+    DISKCACHE_AVAILABLE = True
 except ImportError:
-    GROQ_AVAILABLE = False
+    DISKCACHE_AVAILABLE = False
 
-class GroqInsightsGenerator:
-    """Premium AI-powered insights with detailed analysis"""
+# Per-trade insights persisted across restarts (same cache root as Breeze market data).
+# Only single-trade completions go here - portfolio-wide figures never touch disk.
+if DISKCACHE_AVAILABLE:
+    insights_cache = dc.Cache(str(Path.home() / '.tradeaudit_cache' / 'insights'))
+else:
+    insights_cache = None
+
+INSIGHT_CACHE_EXPIRE = 7 * 86400
+
+
+@lru_cache(maxsize=1)
+def _get_groq():
+    """groq module, imported on first use (None when not installed)"""
+    try:
+        import groq
+    except ImportError:
+        return None
+    return groq
+
+
+def _insight_key(model, system_prompt, prompt, temperature, max_tokens, json_mode=False):
+    """Stable disk-cache key for one completion request (the prompt holds all trade fields)"""
+    payload = json.dumps([model, system_prompt, prompt, temperature, max_tokens, json_mode])
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+
+TIMEOUT_MESSAGE = "⚠️ AI insight timed out. Please try again in a moment."
+
+PORTFOLIO_COACH_PROMPT = "You are a professional trading coach. Provide specific, data-driven insights with actual numbers. Focus on measurable, actionable recommendations."
+
+TRADE_ANALYST_PROMPT = "You are an elite trading analyst. Provide specific, data-driven insights. Always reference actual numbers. No generic advice."
+
+
+class TokenBucket:
+    """
+    Proactive request limiter: sustains `rpm` requests per minute, bursts up to `rpm`
     
-    def __init__(self):
-        self.client = None
-        self.connected = False
+    Callers reserve a token up front and sleep off any deficit, so requests
+    are spaced out instead of tripping 429s and waiting on retry-after.
+    """
     
-    def connect(self):
-        """Connect to Groq API"""
-        if not GROQ_AVAILABLE:
-            return False, "Groq package not installed. Run: pip install groq"
-        
-        try:
-            api_key = st.secrets["groq"]["api_key"]
-            self.client = Groq(api_key=api_key)
-            self.connected = True
-            return True, "Connected to Groq API successfully"
-        except KeyError:
-            return False, "Groq API key not found in secrets"
-        except Exception as e:
-            return False, f"Groq connection failed: {str(e)}"
+    def __init__(self, rpm):
+        self.capacity = float(rpm)
+        self.rate = rpm / 60.0
+        self.tokens = float(rpm)
+        self.last = time.monotonic()
+        # A thread lock (not asyncio.Lock): the bucket outlives event loops and is shared by sessions
+        self.lock = threading.Lock()
     
-    def generate_trade_insight(self, trade_data, setup_analysis=None):
-        """Generate premium insight for single trade with specifics"""
-        
-        if not GROQ_AVAILABLE:
-            return "⚠️ AI insights unavailable: Groq package not installed"
-        
-        if not self.connected:
-            success, msg = self.connect()
-            if not success:
-                return f"⚠️ {msg}"
-        
-        # PREMIUM PROMPT with specific data
-        direction = trade_data.get('direction', 'LONG')
-        symbol = trade_data.get('symbol', 'Unknown')
-        entry_price = trade_data.get('entry_price', 0)
-        exit_price = trade_data.get('exit_price', 0)
-        net_pnl = trade_data.get('net_pnl', 0)
-        return_pct = trade_data.get('return_pct', 0)
-        holding_mins = trade_data.get('holding_period_minutes', 0)
-        charges = trade_data.get('total_charges', 0)
-        qty = trade_data.get('quantity', 0)
-        
-        win_loss = "WIN" if net_pnl > 0 else "LOSS"
-        
-        prompt = f"""You are a professional trading analyst. Analyze this trade with SPECIFIC, ACTIONABLE insights.
+    def _reserve(self):
+        """Take one token; returns how long to wait before using it"""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.last) * self.rate)
+            self.last = now
+            self.tokens -= 1
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+    
+    async def acquire(self):
+        """Wait for a token inside an event loop"""
+        delay = self._reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+    
+    def acquire_sync(self):
+        """Wait for a token from synchronous code"""
+        delay = self._reserve()
+        if delay > 0:
+            time.sleep(delay)
 
-TRADE DATA:
-• Symbol: {symbol}
+
+@st.cache_resource(show_spinner=False)
+def _get_rate_limiter(api_key, rpm):
+    """Token bucket shared by every session using this key (limits are per key)"""
+    return TokenBucket(rpm)
+
+
+@st.cache_resource(show_spinner=False)
+def _get_groq_client(api_key):
+    """
+    Groq client shared by all sessions using this key
+    
+    Backed by one pooled httpx client, so keep-alive connections (and their
+    TLS handshakes) are reused across reruns and sessions.
+    """
+    import httpx
+    
+    return _get_groq().Groq(
+        api_key=api_key,
+        http_client=httpx.Client(
+            limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+            timeout=30
+        ),
+        **_client_limits()
+    )
+
+
+def _client_limits():
+    """Per-request timeout and retry bounds shared by the sync and async clients"""
+    import httpx
+    
+    return {"timeout": httpx.Timeout(20.0, connect=5.0), "max_retries": 3}
+
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def _cached_completion(_client, _limiter, model, system_prompt, prompt, temperature, max_tokens, json_mode=False,
+                       persist=False):
+    """
+    Chat completion memoized on its inputs (client and limiter are not hashed)
+    
+    Exceptions propagate and are not cached, so failed calls are retried.
+    persist: also keep the result in the on-disk insights cache - only for
+    single-trade insights; only requests that miss the caches take a
+    rate-limit token.
+    """
+    disk = insights_cache if persist else None
+    key = _insight_key(model, system_prompt, prompt, temperature, max_tokens, json_mode)
+    cached = disk.get(key) if disk is not None else None
+    if cached is not None:
+        return cached
+    
+    _limiter.acquire_sync()
+    kwargs = {"response_format": {"type": "json_object"}} if json_mode else {}
+    response = _client.chat.completions.create(
+        model=model,
+        messages=[
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": prompt}
+        ],
+        temperature=temperature,
+        max_tokens=max_tokens,
+        **kwargs
+    )
+    content = response.choices[0].message.content
+    
+    if disk is not None:
+        disk.set(key, content, expire=INSIGHT_CACHE_EXPIRE)
+    return content
+
+
+def _stream_completion(client, limiter, model, system_prompt, prompt, temperature, max_tokens):
+    """
+    Chat completion as a stream of text chunks
+    
+    Not disk-cached: it serves the portfolio summary, whose figures stay
+    in the session.
+    """
+    limiter.acquire_sync()
+    stream = client.chat.completions.create(
+        model=model,
+        messages=[
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": prompt}
+        ],
+        temperature=temperature,
+        max_tokens=max_tokens,
+        stream=True
+    )
+    for chunk in stream:
+        text = chunk.choices[0].delta.content or ""
+        if text:
+            yield text
+
+
+# Prompt templates, built once at import and filled with str.format_map
+TRADE_FACTS_TEMPLATE = """• Symbol: {symbol}
 • Direction: {direction}
 • Entry: ₹{entry_price:,.2f}
 • Exit: ₹{exit_price:,.2f}
-• Quantity: {qty:,.0f}
-• Holding Time: {holding_mins} minutes
+• Quantity: {quantity:,.0f}
+• Holding Time: {holding_period_minutes} minutes
 • Result: {win_loss} - ₹{net_pnl:,.0f} ({return_pct:.2f}%)
-• Charges: ₹{charges:,.2f} ({(charges/abs(net_pnl)*100) if net_pnl != 0 else 0:.1f}% of P&L)
+• Charges: ₹{total_charges:,.2f} ({charges_pct:.1f}% of P&L)"""
+
+TRADE_PROMPT_TEMPLATE = """You are a professional trading analyst. Analyze this trade with SPECIFIC, ACTIONABLE insights.
+
+TRADE DATA:
+{trade_facts}
 
 REQUIRED OUTPUT FORMAT:
 1. **What Happened**: 1 sentence on price movement
-2. **Execution Quality**: Comment on timing, holding period (was {holding_mins} min optimal?)
+2. **Execution Quality**: Comment on timing, holding period (was {holding_period_minutes} min optimal?)
 3. **Key Mistake/Success**: Specific actionable point with numbers
 4. **Improvement**: One concrete action for next similar trade
 
 Keep response under 120 words. Use actual numbers from data. Be direct and specific.
 """
-        
-        try:
-            response = self.client.chat.completions.create(
-                model=st.secrets.get("groq", {}).get("model", "llama-3.3-70b-versatile"),
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "You are an elite trading analyst. Provide specific, data-driven insights. Always reference actual numbers. No generic advice."
-                    },
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.7,
-                max_tokens=250
-            )
-            
-            return response.choices[0].message.content
-            
-        except Exception as e:
-            return f"⚠️ Error: {str(e)}"
+
+TRADE_DEFAULTS = {
+    'symbol': 'Unknown',
+    'direction': 'LONG',
+    'entry_price': 0,
+    'exit_price': 0,
+    'quantity': 0,
+    'holding_period_minutes': 0,
+    'net_pnl': 0,
+    'return_pct': 0,
+    'total_charges': 0,
+}
+
+
+def _trade_values(trade_data):
+    """Template fields for one trade (defaults for missing keys, derived fields added)"""
+    values = {key: trade_data.get(key, default) for key, default in TRADE_DEFAULTS.items()}
+    net_pnl = values['net_pnl']
+    values['win_loss'] = "WIN" if net_pnl > 0 else "LOSS"
+    values['charges_pct'] = (values['total_charges'] / abs(net_pnl) * 100) if net_pnl != 0 else 0
+    return values
+
+
+def _trade_prompt(trade_data):
+    """Single-trade analysis prompt"""
+    values = _trade_values(trade_data)
+    return TRADE_PROMPT_TEMPLATE.format_map({**values, 'trade_facts': TRADE_FACTS_TEMPLATE.format_map(values)})
+
+
+def _portfolio_prompt(stats, trades_df, symbol_pnl=None):
+    """Portfolio summary prompt from the stats dict and per-symbol P&L"""
     
-    def generate_portfolio_summary(self, stats, trades_df):
-        """Premium portfolio analysis with specific recommendations"""
-        
-        if not self.connected:
-            self.connect()
-        
-        # Extract key metrics
-        total_trades = stats.get('total_trades', 0)
-        win_rate = stats.get('win_rate', 0)
-        net_pnl = stats.get('net_pnl', 0)
-        profit_factor = stats.get('profit_factor', 0)
-        avg_win = stats.get('avg_win', 0)
-        avg_loss = stats.get('avg_loss', 0)
-        largest_win = stats.get('largest_win', 0)
-        largest_loss = stats.get('largest_loss', 0)
-        
-        # Direction stats
-        long_trades = stats.get('long_trades', 0)
-        short_trades = stats.get('short_trades', 0)
-        long_pnl = stats.get('long_pnl', 0)
-        short_pnl = stats.get('short_pnl', 0)
-        long_wr = stats.get('long_win_rate', 0)
-        short_wr = stats.get('short_win_rate', 0)
-        
-        # Top symbols
-        if 'symbol' in trades_df.columns and 'net_pnl' in trades_df.columns:
-            symbol_pnl = trades_df.groupby('symbol')['net_pnl'].sum().sort_values(ascending=False)
-            best_symbol = symbol_pnl.index[0] if len(symbol_pnl) > 0 else 'N/A'
-            best_symbol_pnl = symbol_pnl.iloc[0] if len(symbol_pnl) > 0 else 0
-            worst_symbol = symbol_pnl.index[-1] if len(symbol_pnl) > 0 else 'N/A'
-            worst_symbol_pnl = symbol_pnl.iloc[-1] if len(symbol_pnl) > 0 else 0
-        else:
-            best_symbol = worst_symbol = 'N/A'
-            best_symbol_pnl = worst_symbol_pnl = 0
-        
-        prompt = f"""Analyze this trading portfolio with SPECIFIC insights and actionable recommendations.
+    # Extract key metrics
+    total_trades = stats.get('total_trades', 0)
+    win_rate = stats.get('win_rate', 0)
+    net_pnl = stats.get('net_pnl', 0)
+    profit_factor = stats.get('profit_factor', 0)
+    avg_win = stats.get('avg_win', 0)
+    avg_loss = stats.get('avg_loss', 0)
+    largest_win = stats.get('largest_win', 0)
+    largest_loss = stats.get('largest_loss', 0)
+    
+    # Direction stats
+    long_trades = stats.get('long_trades', 0)
+    short_trades = stats.get('short_trades', 0)
+    long_pnl = stats.get('long_pnl', 0)
+    short_pnl = stats.get('short_pnl', 0)
+    long_wr = stats.get('long_win_rate', 0)
+    short_wr = stats.get('short_win_rate', 0)
+    
+    # Top symbols
+    if symbol_pnl is None and 'symbol' in trades_df.columns and 'net_pnl' in trades_df.columns:
+        symbol_pnl = trades_df.groupby('symbol', sort=False, observed=True)['net_pnl'].sum()
+    
+    if symbol_pnl is not None and len(symbol_pnl) > 0:
+        # Only the extremes are used - two O(n) scans instead of a full sort
+        best_symbol, best_symbol_pnl = _extreme(symbol_pnl.nlargest(1))
+        worst_symbol, worst_symbol_pnl = _extreme(symbol_pnl.nsmallest(1))
+    else:
+        best_symbol = worst_symbol = 'N/A'
+        best_symbol_pnl = worst_symbol_pnl = 0
+    
+    return f"""Analyze this trading portfolio with SPECIFIC insights and actionable recommendations.
 
 PORTFOLIO METRICS:
 • Total Trades: {total_trades}
@@ -162,26 +296,227 @@ REQUIRED OUTPUT:
 
 Keep total response under 150 words. Use actual numbers. Be direct and actionable.
 """
+
+
+def _extreme(top):
+    """(label, value) of a one-element nlargest/nsmallest result"""
+    return top.index[0], top.iloc[0]
+
+
+def _format_trade(trade_data):
+    """Bullet-point trade facts shared by the single and batched prompts"""
+    return TRADE_FACTS_TEMPLATE.format_map(_trade_values(trade_data))
+
+
+class GroqInsightsGenerator:
+    """Premium AI-powered insights with detailed analysis"""
+    
+    def __init__(self):
+        self.client = None
+        self.api_key = None
+        self.limiter = None
+        self.connected = False
+    
+    def connect(self):
+        """Connect to Groq API (no-op once connected)"""
+        if self.connected:
+            return True, "Connected to Groq API successfully"
+        
+        groq = _get_groq()
+        if groq is None:
+            return False, "Groq package not installed. Run: pip install groq"
+        
+        try:
+            api_key = st.secrets["groq"]["api_key"]
+            self.client = _get_groq_client(api_key)
+            self.api_key = api_key
+            self.limiter = _get_rate_limiter(api_key, st.secrets["groq"].get("rpm", 30))
+            self.connected = True
+            return True, "Connected to Groq API successfully"
+        except KeyError:
+            return False, "Groq API key not found in secrets"
+        except Exception as e:
+            return False, f"Groq connection failed: {str(e)}"
+    
+    def generate_trade_insight(self, trade_data, setup_analysis=None):
+        """Generate premium insight for single trade with specifics"""
+        
+        if _get_groq() is None:
+            return "⚠️ AI insights unavailable: Groq package not installed"
+        
+        if not self.connected:
+            success, msg = self.connect()
+            if not success:
+                return f"⚠️ {msg}"
+        
+        # PREMIUM PROMPT with specific data
+        prompt = _trade_prompt(trade_data)
+        
+        try:
+            return _cached_completion(
+                self.client,
+                self.limiter,
+                st.secrets.get("groq", {}).get("model", "llama-3.3-70b-versatile"),
+                TRADE_ANALYST_PROMPT,
+                prompt,
+                temperature=0.7,
+                max_tokens=180,
+                persist=True
+            )
+            
+        except _get_groq().APITimeoutError:
+            return TIMEOUT_MESSAGE
+        except Exception as e:
+            return f"⚠️ Error: {str(e)}"
+    
+    def generate_trade_insights_batch(self, trades):
+        """
+        Insights for several trades from a single request
+        
+        Returns one string per trade, in order. Falls back to per-trade
+        calls if the model's reply is not the expected JSON.
+        """
+        
+        if not trades:
+            return []
+        
+        if _get_groq() is None:
+            return ["⚠️ AI insights unavailable: Groq package not installed"] * len(trades)
+        
+        if not self.connected:
+            success, msg = self.connect()
+            if not success:
+                return [f"⚠️ {msg}"] * len(trades)
+        
+        trades_text = "\n\n".join(
+            f"TRADE {i}:\n{_format_trade(trade)}" for i, trade in enumerate(trades, 1)
+        )
+        
+        prompt = f"""Analyze each of these {len(trades)} trades with SPECIFIC, ACTIONABLE insights.
+
+{trades_text}
+
+For each one cover what happened, execution quality, the key mistake/success and one concrete improvement.
+Use actual numbers from the data. Be direct and specific.
+
+Return strictly a JSON object {{"insights": [...]}} holding a JSON array of {len(trades)} strings, each under 80 words, string i analyzing trade i.
+"""
         
         try:
-            response = self.client.chat.completions.create(
-                model=st.secrets.get("groq", {}).get("model", "llama-3.3-70b-versatile"),
+            content = _cached_completion(
+                self.client,
+                self.limiter,
+                st.secrets.get("groq", {}).get("model", "llama-3.3-70b-versatile"),
+                TRADE_ANALYST_PROMPT,
+                prompt,
+                temperature=0.7,
+                max_tokens=1000,
+                json_mode=True
+            )
+            insights = json.loads(content)["insights"]
+            if isinstance(insights, list) and len(insights) == len(trades):
+                return [str(insight) for insight in insights]
+        except Exception:
+            pass
+        
+        return self._trade_insights_each(trades)
+    
+    def _trade_insights_each(self, trades):
+        """Per-trade insights, requested concurrently"""
+        return asyncio.run(self.generate_bulk(trades))
+    
+    async def agenerate_trade_insight(self, trade_data, client):
+        """Async generate_trade_insight (client: an AsyncGroq bound to the running loop)"""
+        model = st.secrets.get("groq", {}).get("model", "llama-3.3-70b-versatile")
+        prompt = _trade_prompt(trade_data)
+        
+        key = _insight_key(model, TRADE_ANALYST_PROMPT, prompt, 0.7, 180)
+        cached = insights_cache.get(key) if insights_cache is not None else None
+        if cached is not None:
+            return cached
+        
+        try:
+            await self.limiter.acquire()
+            response = await client.chat.completions.create(
+                model=model,
                 messages=[
-                    {
-                        "role": "system",
-                        "content": "You are a professional trading coach. Provide specific, data-driven insights with actual numbers. Focus on measurable, actionable recommendations."
-                    },
+                    {"role": "system", "content": TRADE_ANALYST_PROMPT},
                     {"role": "user", "content": prompt}
                 ],
                 temperature=0.7,
-                max_tokens=300
+                max_tokens=180
             )
+            content = response.choices[0].message.content
+            if insights_cache is not None:
+                insights_cache.set(key, content, expire=INSIGHT_CACHE_EXPIRE)
+            return content
+        except _get_groq().APITimeoutError:
+            return TIMEOUT_MESSAGE
+        except Exception as e:
+            return f"⚠️ Error: {str(e)}"
+    
+    async def generate_bulk(self, trades, max_concurrency=8):
+        """Insights for several trades gathered concurrently (at most max_concurrency in flight)"""
+        semaphore = asyncio.Semaphore(max_concurrency)
+        
+        # AsyncGroq's connection pool belongs to this event loop, so one client per run
+        async with _get_groq().AsyncGroq(api_key=self.api_key, **_client_limits()) as client:
+            async def one(trade):
+                async with semaphore:
+                    return await self.agenerate_trade_insight(trade, client)
             
-            return response.choices[0].message.content
+            return await asyncio.gather(*(one(trade) for trade in trades))
+    
+    def generate_portfolio_summary(self, stats, trades_df, symbol_pnl=None):
+        """
+        Premium portfolio analysis with specific recommendations
+        
+        symbol_pnl: optional precomputed net P&L per symbol (skips the groupby)
+        """
+        
+        if not self.connected:
+            self.connect()
+        
+        try:
+            return _cached_completion(
+                self.client,
+                self.limiter,
+                st.secrets.get("groq", {}).get("model", "llama-3.3-70b-versatile"),
+                PORTFOLIO_COACH_PROMPT,
+                _portfolio_prompt(stats, trades_df, symbol_pnl),
+                temperature=0.7,
+                max_tokens=220
+            )
             
         except:
             return ""
     
+    def stream_portfolio_summary(self, stats, trades_df, symbol_pnl=None):
+        """
+        generate_portfolio_summary as a stream of text chunks
+        
+        Lets the page show the reply from the first token instead of after
+        the whole completion. Yields nothing on failure.
+        """
+        
+        if not self.connected:
+            success, _ = self.connect()
+            if not success:
+                return
+        
+        try:
+            yield from _stream_completion(
+                self.client,
+                self.limiter,
+                st.secrets.get("groq", {}).get("model", "llama-3.3-70b-versatile"),
+                PORTFOLIO_COACH_PROMPT,
+                _portfolio_prompt(stats, trades_df, symbol_pnl),
+                temperature=0.7,
+                max_tokens=220
+            )
+        except Exception:
+            return
+    
     def generate_pattern_insights(self, patterns_detected):
         """Premium pattern analysis with specific actions"""
         
@@ -214,30 +549,22 @@ Be direct, specific, and actionable.
 """
         
         try:
-            response = self.client.chat.completions.create(
-                model=st.secrets.get("groq", {}).get("model", "llama-3.3-70b-versatile"),
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "You are a trading psychology expert. Provide specific, implementable solutions."
-                    },
-                    {"role": "user", "content": prompt}
-                ],
+            return _cached_completion(
+                self.client,
+                self.limiter,
+                st.secrets.get("groq", {}).get("model", "llama-3.3-70b-versatile"),
+                "You are a trading psychology expert. Provide specific, implementable solutions.",
+                prompt,
                 temperature=0.8,
-                max_tokens=350
+                max_tokens=280
             )
             
-            return response.choices[0].message.content
-            
         except:
             return ""
 
 
-_groq_instance = None
-
 def get_groq_generator():
-    """Get or create Groq generator instance"""
-    global _groq_instance
-    if _groq_instance is None:
-        _groq_instance = GroqInsightsGenerator()
-    return _groq_instance
\ No newline at end of file
+    """Get or create the session's Groq generator instance"""
+    if 'groq_gen' not in st.session_state:
+        st.session_state['groq_gen'] = GroqInsightsGenerator()
+    return st.session_state['groq_gen']
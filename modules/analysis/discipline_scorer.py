@@ -3,6 +3,8 @@ Enhanced Discipline Scorer - Phase 2
 Includes short sell awareness and improved scoring logic
 """
 
+import bisect
+import streamlit as st
 import pandas as pd
 import numpy as np
 
@@ -12,14 +14,17 @@ def calculate_discipline_scores(trades_df):
     if len(trades_df) == 0:
         return trades_df
     
-    scores = []
-    
-    for idx, trade in trades_df.iterrows():
-        score = calculate_single_trade_score(trade)
-        scores.append(score)
-    
-    trades_df['discipline_score'] = scores
-    trades_df['grade'] = trades_df['discipline_score'].apply(score_to_grade)
+    holding = trades_df['holding_period_minutes'] if 'holding_period_minutes' in trades_df.columns else pd.Series(0, index=trades_df.index)
+    trade_type = trades_df['trade_type'] if 'trade_type' in trades_df.columns else pd.Series('Unknown', index=trades_df.index)
+    
+    trades_df['discipline_score'] = _score_vectorized(
+        trades_df['net_pnl'].to_numpy(dtype=np.float64),
+        trades_df['entry_price'].to_numpy(dtype=np.float64) * trades_df['quantity'].to_numpy(dtype=np.float64),
+        holding.to_numpy(dtype=np.float64),
+        trades_df['total_charges'].to_numpy(dtype=np.float64),
+        trade_type.to_numpy(),
+    )
+    trades_df['grade'] = pd.cut(trades_df['discipline_score'], bins=GRADE_BINS, labels=GRADE_LABELS, right=False)
     trades_df['win'] = trades_df['net_pnl'] > 0
     
     # Calculate return percentage
@@ -28,6 +33,63 @@ def calculate_discipline_scores(trades_df):
     return trades_df
 
 
+# Score -> grade bands (left-closed): a score of 70 is a B
+GRADE_THRESHOLDS = (50, 60, 70, 80, 90)
+GRADE_LABELS = ('F', 'D', 'C', 'B', 'A', 'A+')
+GRADE_BINS = [-np.inf, *GRADE_THRESHOLDS, np.inf]
+
+
+def _score_vectorized(pnl, position_value, holding_mins, charges, trade_type):
+    """
+    Column-wise version of calculate_single_trade_score (same thresholds)
+    
+    NaN inputs fall through to the same buckets as the row-wise scorer.
+    
+    Returns:
+        np.ndarray: int64 score per trade
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return_pct = np.where(position_value > 0, pnl / position_value * 100, 0.0)
+        charges_pct = np.where(pnl != 0, charges / np.abs(pnl) * 100, 100.0)
+    abs_return = np.abs(return_pct)
+    win = pnl > 0
+    
+    # 1. P&L Performance (30 points)
+    pnl_points = np.select(
+        [win & (return_pct > 2), win & (return_pct > 1), win & (return_pct > 0.5), win,
+         abs_return < 0.5, abs_return < 1, abs_return < 2],
+        [30, 25, 20, 15, 15, 10, 5],
+        default=0
+    )
+    
+    # 2. Holding Period (20 points)
+    holding_points = np.select(
+        [holding_mins < 0, holding_mins < 5, (holding_mins >= 15) & (holding_mins <= 240),
+         (holding_mins > 240) & (holding_mins <= 480), holding_mins > 1440],
+        [10, 5, 20, 15, 18],
+        default=10
+    )
+    
+    # 3. Position Sizing (20 points)
+    size_points = np.select(
+        [(position_value >= 10000) & (position_value <= 500000),
+         (position_value >= 5000) & (position_value < 10000),
+         (position_value > 500000) & (position_value <= 1000000),
+         position_value > 1000000],
+        [20, 15, 10, 5],
+        default=10
+    )
+    
+    # 4. Risk Management (15 points)
+    risk_points = np.select([charges_pct < 10, charges_pct < 25, charges_pct < 50], [15, 12, 8], default=5)
+    
+    # 5. Execution Quality (15 points)
+    execution_points = np.select([trade_type == 'Intraday', trade_type == 'Delivery'], [15, 12], default=10)
+    
+    total = pnl_points + holding_points + size_points + risk_points + execution_points
+    return np.minimum(total, 100).astype(np.int64)
+
+
 def calculate_single_trade_score(trade):
     """Score a single trade on 0-100 scale"""
     
@@ -110,74 +172,99 @@ def calculate_single_trade_score(trade):
 
 def score_to_grade(score):
     """Convert numeric score to letter grade"""
-    if score >= 90:
-        return 'A+'
-    elif score >= 80:
-        return 'A'
-    elif score >= 70:
-        return 'B'
-    elif score >= 60:
-        return 'C'
-    elif score >= 50:
-        return 'D'
-    else:
+    if score != score:  # NaN fails every cut-off
         return 'F'
+    return GRADE_LABELS[bisect.bisect_right(GRADE_THRESHOLDS, score)]
+
+
+# Columns calculate_portfolio_stats reads; only these feed its cache key
+STATS_COLUMNS = ['net_pnl', 'gross_pnl', 'total_charges', 'discipline_score', 'direction',
+                 'brokerage', 'stt', 'gst', 'misc_charges']
+
 
+def _stats_fingerprint(trades_df):
+    """Content hash of the stats columns (order-sensitive, index ignored)"""
+    cols = [c for c in STATS_COLUMNS if c in trades_df.columns]
+    return (tuple(cols), pd.util.hash_pandas_object(trades_df[cols], index=False).values.tobytes())
 
+
+@st.cache_data(show_spinner=False, hash_funcs={pd.DataFrame: _stats_fingerprint})
 def calculate_portfolio_stats(trades_df):
     """Calculate comprehensive portfolio statistics"""
     
     if len(trades_df) == 0:
         return {}
     
-    wins = trades_df[trades_df['net_pnl'] > 0]
-    losses = trades_df[trades_df['net_pnl'] <= 0]
+    # Pull each column once; every stat below reduces over these arrays
+    pnl = trades_df['net_pnl'].to_numpy(dtype=np.float64)
+    is_win = pnl > 0
+    is_loss = pnl <= 0
+    win_pnl = pnl[is_win]
+    loss_pnl = pnl[is_loss]
+    
+    n_trades = len(pnl)
+    n_wins = len(win_pnl)
+    n_losses = len(loss_pnl)
+    
+    # Every additive column summed in one shot
+    sum_cols = [c for c in ['gross_pnl', 'total_charges', 'brokerage', 'stt', 'gst', 'misc_charges']
+                if c in trades_df.columns]
+    sums = trades_df[sum_cols].sum()
     
     stats = {
-        'total_trades': len(trades_df),
-        'winning_trades': len(wins),
-        'losing_trades': len(losses),
-        'win_rate': (len(wins) / len(trades_df)) * 100 if len(trades_df) > 0 else 0,
-        'net_pnl': trades_df['net_pnl'].sum(),
-        'gross_pnl': trades_df['gross_pnl'].sum() if 'gross_pnl' in trades_df.columns else 0,
-        'total_charges': trades_df['total_charges'].sum() if 'total_charges' in trades_df.columns else 0,
-        'avg_win': wins['net_pnl'].mean() if len(wins) > 0 else 0,
-        'avg_loss': losses['net_pnl'].mean() if len(losses) > 0 else 0,
-        'largest_win': wins['net_pnl'].max() if len(wins) > 0 else 0,
-        'largest_loss': losses['net_pnl'].min() if len(losses) > 0 else 0,
+        'total_trades': n_trades,
+        'winning_trades': n_wins,
+        'losing_trades': n_losses,
+        'win_rate': (n_wins / n_trades) * 100,
+        'net_pnl': pnl.sum(),
+        'gross_pnl': sums.get('gross_pnl', 0),
+        'total_charges': sums.get('total_charges', 0),
+        'avg_win': win_pnl.mean() if n_wins > 0 else 0,
+        'avg_loss': loss_pnl.mean() if n_losses > 0 else 0,
+        'largest_win': win_pnl.max() if n_wins > 0 else 0,
+        'largest_loss': loss_pnl.min() if n_losses > 0 else 0,
         'avg_discipline_score': trades_df['discipline_score'].mean() if 'discipline_score' in trades_df.columns else 0,
     }
     
     # Profit factor
-    total_wins = wins['net_pnl'].sum() if len(wins) > 0 else 0
-    total_losses = abs(losses['net_pnl'].sum()) if len(losses) > 0 else 1
+    total_wins = win_pnl.sum() if n_wins > 0 else 0
+    total_losses = abs(loss_pnl.sum()) if n_losses > 0 else 1
     stats['profit_factor'] = total_wins / total_losses if total_losses > 0 else 0
     
-    # Direction-specific stats (Phase 2)
+    # Direction-specific stats (Phase 2) - masks reuse the same pnl/win arrays
     if 'direction' in trades_df.columns:
-        long_trades = trades_df[trades_df['direction'] == 'LONG']
-        short_trades = trades_df[trades_df['direction'] == 'SHORT']
+        direction = trades_df['direction']
+        is_long = (direction == 'LONG').to_numpy()
+        is_short = (direction == 'SHORT').to_numpy()
+        
+        n_long = int(is_long.sum())
+        n_short = int(is_short.sum())
         
-        stats['long_trades'] = len(long_trades)
-        stats['short_trades'] = len(short_trades)
-        stats['long_pnl'] = long_trades['net_pnl'].sum() if len(long_trades) > 0 else 0
-        stats['short_pnl'] = short_trades['net_pnl'].sum() if len(short_trades) > 0 else 0
-        stats['long_win_rate'] = (len(long_trades[long_trades['net_pnl'] > 0]) / len(long_trades) * 100) if len(long_trades) > 0 else 0
-        stats['short_win_rate'] = (len(short_trades[short_trades['net_pnl'] > 0]) / len(short_trades) * 100) if len(short_trades) > 0 else 0
+        stats['long_trades'] = n_long
+        stats['short_trades'] = n_short
+        stats['long_pnl'] = pnl[is_long].sum() if n_long > 0 else 0
+        stats['short_pnl'] = pnl[is_short].sum() if n_short > 0 else 0
+        stats['long_win_rate'] = ((is_win & is_long).sum() / n_long * 100) if n_long > 0 else 0
+        stats['short_win_rate'] = ((is_win & is_short).sum() / n_short * 100) if n_short > 0 else 0
     
     # Charge breakdown
     if all(col in trades_df.columns for col in ['brokerage', 'stt', 'gst']):
-        stats['total_brokerage'] = trades_df['brokerage'].sum()
-        stats['total_stt'] = trades_df['stt'].sum()
-        stats['total_gst'] = trades_df['gst'].sum()
+        stats['total_brokerage'] = sums['brokerage']
+        stats['total_stt'] = sums['stt']
+        stats['total_gst'] = sums['gst']
         if 'misc_charges' in trades_df.columns:
-            stats['total_misc'] = trades_df['misc_charges'].sum()
+            stats['total_misc'] = sums['misc_charges']
     
     return stats
 
 
-def detect_behavioral_patterns(trades_df):
-    """Detect trading patterns and behavioral issues"""
+def detect_behavioral_patterns(trades_df, stats=None):
+    """
+    Detect trading patterns and behavioral issues
+    
+    stats: optional calculate_portfolio_stats result for the same trades
+    (computed here when omitted)
+    """
     
     patterns = []
     
@@ -197,16 +284,10 @@ def detect_behavioral_patterns(trades_df):
                 'recommendation': 'Focus on quality over quantity. Set daily trade limit.'
             })
     
-    # 2. Consecutive losses
-    consecutive_losses = 0
-    max_consecutive = 0
-    
-    for _, trade in df.iterrows():
-        if trade['net_pnl'] <= 0:
-            consecutive_losses += 1
-            max_consecutive = max(max_consecutive, consecutive_losses)
-        else:
-            consecutive_losses = 0
+    # 2. Consecutive losses - run lengths: each non-loss starts a new group
+    losses = df['net_pnl'].to_numpy() <= 0
+    run_ids = np.cumsum(~losses)
+    max_consecutive = int(np.bincount(run_ids, weights=losses).max())
     
     if max_consecutive >= 5:
         patterns.append({
@@ -216,8 +297,9 @@ def detect_behavioral_patterns(trades_df):
             'recommendation': 'Take a break after 3 losses. Review strategy.'
         })
     
-    # 3. Win rate vs profit factor mismatch
-    stats = calculate_portfolio_stats(df)
+    # 3. Win rate vs profit factor mismatch (stats don't depend on row order)
+    if stats is None:
+        stats = calculate_portfolio_stats(trades_df)
     if stats['win_rate'] > 60 and stats['profit_factor'] < 1:
         patterns.append({
             'pattern': 'Cutting Winners / Holding Losers',
@@ -5,6 +5,9 @@ Fetches historical market data for trade analysis
 
 import streamlit as st
 from datetime import datetime, timedelta
+import io
+import sys
+import numpy as np
 import pandas as pd
 
 try:
@@ -40,6 +43,7 @@ class BreezeDataFetcher:
             session_token = st.secrets["breeze"]["session_token"]
             
             self.breeze = BreezeConnect(api_key=api_key)
+            _share_http_session(self.breeze)
             
             self.breeze.generate_session(
                 api_secret=secret_key,
@@ -64,7 +68,7 @@ class BreezeDataFetcher:
         
         cached_data = cache.get(cache_key) if cache else None
         if cached_data is not None:
-            return cached_data, None
+            return _from_cache_blob(cached_data), None
         
         if not self.connected:
             success, msg = self.connect()
@@ -83,7 +87,9 @@ class BreezeDataFetcher:
             
             if data['Status'] == 200 and data['Success']:
                 df = pd.DataFrame(data['Success'])
-                df['datetime'] = pd.to_datetime(df['datetime'])
+                # Breeze sends ISO timestamps in IST ('2024-01-15 09:15:00'); the
+                # ISO8601 fast path skips per-element format inference
+                df['datetime'] = pd.to_datetime(df['datetime'], format='ISO8601', cache=True)
                 df = df.rename(columns={
                     'open': 'Open',
                     'high': 'High',
@@ -93,7 +99,7 @@ class BreezeDataFetcher:
                 })
                 
                 if cache:
-                    cache.set(cache_key, df, expire=86400)
+                    cache.set(cache_key, _to_cache_blob(df), expire=86400)
                 
                 return df, None
             else:
@@ -122,17 +128,133 @@ class BreezeDataFetcher:
         if df is None or len(df) == 0:
             return None, "No data available for this timestamp"
         
-        df['time_diff'] = abs((df['datetime'] - timestamp).dt.total_seconds())
-        closest_row = df.loc[df['time_diff'].idxmin()]
-        
-        return {
-            'open': closest_row['Open'],
-            'high': closest_row['High'],
-            'low': closest_row['Low'],
-            'close': closest_row['Close'],
-            'volume': closest_row['Volume'],
-            'timestamp': closest_row['datetime']
-        }, None
+        closest = _nearest_positions(df, [timestamp])[0]
+        
+        return _price_row(df.iloc[closest]), None
+    
+    def get_prices_at_times(self, symbol, exchange, timestamps):
+        """
+        Prices at several timestamps for one symbol from a single data pull
+        
+        Fetches the union window (earliest - 1 day to latest + 1 day) once and
+        resolves every timestamp against it locally.
+        
+        Returns:
+            tuple: (list of price dicts aligned with timestamps, error_message)
+        """
+        if len(timestamps) == 0:
+            return [], None
+        
+        df, error = self.get_historical_data(
+            symbol=symbol,
+            exchange=exchange,
+            from_date=min(timestamps) - timedelta(days=1),
+            to_date=max(timestamps) + timedelta(days=1),
+            interval='1minute'
+        )
+        
+        if error:
+            return None, error
+        
+        if df is None or len(df) == 0:
+            return None, "No data available for these timestamps"
+        
+        return [_price_row(df.iloc[pos]) for pos in _nearest_positions(df, timestamps)], None
+
+
+class _PooledRequests:
+    """
+    Stand-in for the `requests` module inside the Breeze SDK
+    
+    The SDK calls requests.get/post/... at module level, which opens a new
+    connection (TCP + TLS) per call. Verbs are routed through one pooled
+    Session instead; everything else resolves to the real module.
+    """
+    
+    VERBS = ('request', 'get', 'post', 'put', 'delete')
+    
+    def __init__(self, session, module):
+        self._session = session
+        self._module = module
+    
+    def __getattr__(self, name):
+        if name in self.VERBS:
+            return getattr(self._session, name)
+        return getattr(self._module, name)
+
+
+@st.cache_resource(show_spinner=False)
+def _get_http_session():
+    """Keep-alive Session shared by every Breeze call in the process"""
+    import requests
+    
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=10, pool_maxsize=20)
+    session.mount('https://', adapter)
+    return session
+
+
+def _share_http_session(breeze):
+    """
+    Point the Breeze SDK's HTTP calls at the shared pooled Session
+    
+    This is the override point if the SDK changes how it issues requests:
+    it only patches a module-level `requests` reference and leaves the SDK
+    untouched otherwise.
+    """
+    import requests
+    
+    sdk = sys.modules.get(type(breeze).__module__)
+    if sdk is not None and getattr(sdk, 'requests', None) is requests:
+        sdk.requests = _PooledRequests(_get_http_session(), requests)
+
+
+def _nearest_positions(df, timestamps):
+    """
+    Row position of the bar closest to each timestamp
+    
+    Binary search over the bar times instead of a full time-difference scan;
+    ties go to the earlier bar.
+    """
+    if not df['datetime'].is_monotonic_increasing:
+        order = np.argsort(df['datetime'].to_numpy(), kind='stable')
+        return order[_nearest_positions(df.iloc[order], timestamps)]
+    
+    bar_times = df['datetime'].to_numpy().astype('datetime64[ns]')
+    targets = pd.DatetimeIndex(timestamps).to_numpy().astype('datetime64[ns]')
+    
+    pos = np.searchsorted(bar_times, targets)
+    before = np.clip(pos - 1, 0, len(bar_times) - 1)
+    before = np.searchsorted(bar_times, bar_times[before])  # first of any duplicate bars
+    after = np.clip(pos, 0, len(bar_times) - 1)
+    take_after = np.abs(bar_times[after] - targets) < np.abs(targets - bar_times[before])
+    return np.where(take_after, after, before)
+
+
+def _price_row(row):
+    """Price dict for one OHLCV bar"""
+    return {
+        'open': row['Open'],
+        'high': row['High'],
+        'low': row['Low'],
+        'close': row['Close'],
+        'volume': row['Volume'],
+        'timestamp': row['datetime']
+    }
+
+
+def _to_cache_blob(df):
+    """Feather (Arrow IPC) bytes for the disk cache - smaller and faster to load than a pickle"""
+    buffer = io.BytesIO()
+    df.reset_index(drop=True).to_feather(buffer)
+    return buffer.getvalue()
+
+
+def _from_cache_blob(blob):
+    """DataFrame from a cache entry (entries written before Feather are DataFrames)"""
+    if isinstance(blob, pd.DataFrame):
+        return blob
+    return pd.read_feather(io.BytesIO(blob))
 
 
 _breeze_instance = None
@@ -6,19 +6,134 @@ Calculates indicators for setup quality analysis
 import pandas as pd
 import numpy as np
 
+from modules.utils.jit import njit
+
+
+def _as_float_array(prices):
+    """Contiguous float64 view of a price series for the kernels"""
+    return np.ascontiguousarray(prices, dtype=np.float64)
+
+
+@njit(cache=True)
+def _rsi_last(prices, period):
+    """
+    Last RSI value using simple rolling means of gains/losses
+    
+    Same result as the pandas diff/where/rolling formulation: NaN deltas
+    count as zero gain and zero loss.
+    """
+    n = len(prices)
+    gain = 0.0
+    loss = 0.0
+    for i in range(n - period, n):
+        delta = prices[i] - prices[i - 1]
+        if delta > 0:
+            gain += delta
+        elif delta < 0:
+            loss -= delta
+    gain /= period
+    loss /= period
+    
+    if loss == 0:
+        # rs is inf (RSI 100) or 0/0 (undefined)
+        return 100.0 if gain > 0 else np.nan
+    return 100.0 - 100.0 / (1.0 + gain / loss)
+
+
+@njit(cache=True)
+def _ema_last(prices, span):
+    """
+    Last value of pandas' ewm(span=span, adjust=False).mean()
+    
+    Follows pandas' recursion, including how NaN observations are skipped.
+    """
+    alpha = 2.0 / (span + 1.0)
+    old_wt_factor = 1.0 - alpha
+    weighted = prices[0]
+    old_wt = 1.0
+    for i in range(1, len(prices)):
+        cur = prices[i]
+        if weighted == weighted:
+            old_wt *= old_wt_factor
+            if cur == cur:
+                if weighted != cur:
+                    weighted = (old_wt * weighted + alpha * cur) / (old_wt + alpha)
+                old_wt = 1.0
+        elif cur == cur:
+            weighted = cur
+    return weighted
+
+
+SETUP_EMA_SPANS = (10, 20, 30, 50)
+
+
+@njit(cache=True)
+def _setup_indicators(prices, rsi_period, window):
+    """
+    Everything analyze_setup_quality reads from the closes, in one pass
+    
+    Same values as _rsi_last, _ema_last for each of SETUP_EMA_SPANS and the
+    min/max of the last `window` closes (NaN skipped). Expects at least
+    max(rsi_period + 1, window) prices.
+    
+    Returns:
+        tuple: (rsi, ema_10, ema_20, ema_30, ema_50, support, resistance)
+    """
+    n = len(prices)
+    spans = np.array([10.0, 20.0, 30.0, 50.0])
+    alpha = 2.0 / (spans + 1.0)
+    weighted = np.full(4, prices[0])
+    old_wt = np.ones(4)
+    gain = 0.0
+    loss = 0.0
+    support = np.nan
+    resistance = np.nan
+    
+    for i in range(n):
+        cur = prices[i]
+        
+        if i > 0:
+            # EMA recursions (see _ema_last)
+            for k in range(4):
+                if weighted[k] == weighted[k]:
+                    old_wt[k] *= 1.0 - alpha[k]
+                    if cur == cur:
+                        if weighted[k] != cur:
+                            weighted[k] = (old_wt[k] * weighted[k] + alpha[k] * cur) / (old_wt[k] + alpha[k])
+                        old_wt[k] = 1.0
+                elif cur == cur:
+                    weighted[k] = cur
+            
+            # Gains/losses over the last rsi_period deltas (see _rsi_last)
+            if i >= n - rsi_period:
+                delta = cur - prices[i - 1]
+                if delta > 0:
+                    gain += delta
+                elif delta < 0:
+                    loss -= delta
+        
+        if i >= n - window and cur == cur:
+            if not support <= cur:
+                support = cur
+            if not resistance >= cur:
+                resistance = cur
+    
+    gain /= rsi_period
+    loss /= rsi_period
+    if loss == 0:
+        rsi = 100.0 if gain > 0 else np.nan
+    else:
+        rsi = 100.0 - 100.0 / (1.0 + gain / loss)
+    
+    return rsi, weighted[0], weighted[1], weighted[2], weighted[3], support, resistance
+
+
 def calculate_rsi(prices, period=14):
     """Calculate Relative Strength Index"""
     if len(prices) < period + 1:
         return None
     
-    delta = prices.diff()
-    gain = (delta.where(delta > 0, 0)).rolling(window=period).mean()
-    loss = (-delta.where(delta < 0, 0)).rolling(window=period).mean()
-    
-    rs = gain / loss
-    rsi = 100 - (100 / (1 + rs))
-    
-    return rsi.iloc[-1] if len(rsi) > 0 else None
+    return _rsi_last(_as_float_array(prices), period)
 
 
 def calculate_ema(prices, period=20):
@@ -26,8 +141,7 @@ def calculate_ema(prices, period=20):
     if len(prices) < period:
         return None
     
-    ema = prices.ewm(span=period, adjust=False).mean()
-    return ema.iloc[-1] if len(ema) > 0 else None
+    return _ema_last(_as_float_array(prices), period)
 
 
 def determine_trend(prices, short_period=10, long_period=30):
@@ -38,6 +152,11 @@ def determine_trend(prices, short_period=10, long_period=30):
     short_ema = calculate_ema(prices, short_period)
     long_ema = calculate_ema(prices, long_period)
     
+    return _trend_from_emas(short_ema, long_ema)
+
+
+def _trend_from_emas(short_ema, long_ema):
+    """Trend label from the short and long EMA values"""
     if short_ema is None or long_ema is None:
         return 'unknown'
     
@@ -76,16 +195,99 @@ def analyze_setup_quality(ohlcv_data, entry_price, entry_time):
     close_prices = historical['Close']
     volume = historical['Volume']
     
-    rsi = calculate_rsi(close_prices)
-    ema_20 = calculate_ema(close_prices, 20)
-    ema_50 = calculate_ema(close_prices, 50)
-    support, resistance = identify_support_resistance(close_prices)
-    trend = determine_trend(close_prices)
+    # RSI, EMAs and support/resistance from a single sweep over the closes
+    rsi, ema_10, ema_20, ema_30, ema_50, support, resistance = _setup_indicators(
+        _as_float_array(close_prices), 14, 20
+    )
+    if len(close_prices) < 50:
+        ema_50 = None
+    trend = _trend_from_emas(ema_10, ema_30)
     
     current_price = close_prices.iloc[-1]
     current_volume = volume.iloc[-1]
     avg_volume = volume.tail(20).mean()
     
+    return _setup_analysis(entry_price, current_price, trend, rsi, ema_20, ema_50,
+                           support, resistance, current_volume, avg_volume)
+
+
+def precompute_indicators(ohlcv_data):
+    """
+    Indicator series over a whole OHLCV frame (sorted by datetime), computed once
+    
+    Position i holds the value analyze_setup_quality derives from bars 0..i.
+    
+    Returns:
+        dict: numpy arrays aligned with ohlcv_data rows
+    """
+    close = ohlcv_data['Close']
+    volume = ohlcv_data['Volume']
+    
+    delta = close.diff()
+    gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
+    loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
+    rsi = 100 - (100 / (1 + gain / loss))
+    
+    return {
+        'close': close.to_numpy(),
+        'volume': volume.to_numpy(),
+        'rsi': rsi.to_numpy(),
+        'ema_10': close.ewm(span=10, adjust=False).mean().to_numpy(),
+        'ema_20': close.ewm(span=20, adjust=False).mean().to_numpy(),
+        'ema_30': close.ewm(span=30, adjust=False).mean().to_numpy(),
+        'ema_50': close.ewm(span=50, adjust=False).mean().to_numpy(),
+        'support': close.rolling(window=20, min_periods=1).min().to_numpy(),
+        'resistance': close.rolling(window=20, min_periods=1).max().to_numpy(),
+        'avg_volume': volume.rolling(window=20, min_periods=1).mean().to_numpy(),
+    }
+
+
+def analyze_setup_quality_batch(ohlcv_data, entries):
+    """
+    analyze_setup_quality for many trades against the same OHLCV data
+    
+    entries: DataFrame with entry_price and entry_time columns.
+    Indicators are computed once; each entry's bar is found with searchsorted.
+    
+    Returns:
+        list: analysis dict per entry (None when fewer than 30 bars precede it)
+    """
+    if ohlcv_data is None or len(ohlcv_data) == 0:
+        return [None] * len(entries)
+    
+    ohlcv = ohlcv_data.sort_values('datetime', kind='stable')
+    indicators = precompute_indicators(ohlcv)
+    
+    # Index of the last bar at or before each entry
+    positions = ohlcv['datetime'].searchsorted(entries['entry_time'], side='right') - 1
+    
+    results = []
+    for pos, entry_price in zip(positions, entries['entry_price'].to_numpy()):
+        bars = pos + 1
+        if bars < 30:
+            results.append(None)
+            continue
+        
+        trend = _trend_from_emas(indicators['ema_10'][pos], indicators['ema_30'][pos])
+        results.append(_setup_analysis(
+            entry_price,
+            indicators['close'][pos],
+            trend,
+            indicators['rsi'][pos],
+            indicators['ema_20'][pos],
+            indicators['ema_50'][pos] if bars >= 50 else None,
+            indicators['support'][pos],
+            indicators['resistance'][pos],
+            indicators['volume'][pos],
+            indicators['avg_volume'][pos],
+        ))
+    
+    return results
+
+
+def _setup_analysis(entry_price, current_price, trend, rsi, ema_20, ema_50,
+                    support, resistance, current_volume, avg_volume):
+    """Analysis dict with signals and setup score from indicator values at entry"""
     analysis = {
         'entry_price': entry_price,
         'market_price': current_price,
@@ -130,15 +332,14 @@ def analyze_setup_quality(ohlcv_data, entry_price, entry_time):
     return analysis
 
 
+# Setup-score adjustment per trend label (sideways/unknown add nothing)
+TREND_POINTS = {'uptrend': 15, 'downtrend': -10}
+
+
 def calculate_setup_score(analysis, signals):
     """Score the setup quality on 0-100 scale"""
     
-    score = 50
-    
-    if analysis['trend'] == 'uptrend':
-        score += 15
-    elif analysis['trend'] == 'downtrend':
-        score -= 10
+    score = 50 + TREND_POINTS.get(analysis['trend'], 0)
     
     if analysis['rsi']:
         if 40 <= analysis['rsi'] <= 60:
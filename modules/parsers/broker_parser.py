@@ -3,30 +3,33 @@ Broker Parser Router - Updated for Phase 2 Final
 Returns 3 values: trades_df, attention_df, error
 """
 
-import pandas as pd
 from modules.parsers import kotak_parser
+from modules.utils import csv_reader
 
 def parse_broker_file(file, trade_type='equity'):
     """
     Parse broker file and return trades + attention items
     
+    Args:
+        file: raw CSV bytes (e.g. uploaded_file.getvalue()) or a file-like object
+    
     Returns:
         tuple: (trades_df, attention_df, error_message)
     """
     
     try:
-        df_sample = pd.read_csv(file, nrows=5, encoding='utf-8-sig')
-        file.seek(0)
+        data = file if isinstance(file, (bytes, bytearray, memoryview)) else file.read()
         
-        columns = [col.lower().strip() for col in df_sample.columns]
+        columns = [col.lower().strip() for col in csv_reader.header_columns(data)]
         
         # Detect Kotak format
         if any('trade date' in col for col in columns) and \
            any('transaction type' in col for col in columns):
-            return kotak_parser.parse_kotak(file, trade_type)
+            return kotak_parser.parse_kotak(data, trade_type)
         
         else:
             return None, None, "Unsupported broker format. Currently supports: Kotak Securities"
     
     except Exception as e:
-        return None, None, f"Error: {str(e)}"
\ No newline at end of file
+        return None, None, f"Error: {str(e)}"
+
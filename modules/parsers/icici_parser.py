@@ -3,15 +3,16 @@ ICICI Direct Parser - Phase 2
 Uses FIFO logic similar to Kotak (Coming soon)
 """
 
-import pandas as pd
+from modules.utils import csv_reader
 
 def parse_icici(file):
     """Parse ICICI Direct orderbook CSV"""
     try:
-        df = pd.read_csv(file)
+        # Header only - the stub never needs the rows
+        columns = csv_reader.header_columns(file)
         
         required_cols = ['Stock', 'Order Ref.', 'Settlement']
-        if not all(col in df.columns for col in required_cols):
+        if not all(col in columns for col in required_cols):
             return None, "Invalid ICICI format"
         
         return None, "ICICI FIFO parser coming soon. Use Kotak format for now."
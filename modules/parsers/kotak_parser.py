@@ -5,45 +5,118 @@ Kotak Securities Parser - Phase 2 FIXED
 - Tracks attention-required trades
 """
 
+import hashlib
+import threading
+from collections import OrderedDict
+
 import pandas as pd
-from datetime import datetime
-from collections import deque
+import numpy as np
+
+from modules.utils import csv_reader
+
+# Statement columns the parser reads (the rest of the file is never converted)
+KOTAK_COLUMNS = ['Trade Date', 'Trade Time', 'Order Time', 'Transaction Type', 'Quantity', 'Market Rate',
+                 'Total', 'Brokerage', 'GST', 'STT/CTT', 'Misc.', 'Security Name', 'Exchange']
+
+# Trade-record fields rounded to paise
+MONEY_COLUMNS = ['entry_price', 'exit_price', 'gross_pnl', 'brokerage', 'stt', 'gst', 'misc_charges',
+                 'total_charges', 'net_pnl']
+
+# Output schemas (empty results keep their columns)
+TRADE_COLUMNS = ['broker', 'symbol', 'direction', 'entry_date', 'entry_time', 'exit_time', 'quantity',
+                 'entry_price', 'exit_price', 'gross_pnl', 'brokerage', 'stt', 'gst', 'misc_charges',
+                 'total_charges', 'net_pnl', 'holding_period_minutes', 'trade_type', 'trade_category', 'exchange']
+ATTENTION_COLUMNS = ['symbol', 'reason', 'buy_qty', 'sell_qty', 'difference', 'status', 'message', 'trades']
+
+# Parsed statements keyed by (content digest, trade type) - re-submitting a file skips the parse
+PARSE_CACHE_SIZE = 16
+_parse_cache = OrderedDict()
+_parse_cache_lock = threading.Lock()  # Streamlit sessions share the module
 
 def parse_kotak(file, trade_type='equity'):
     """
     Parse Kotak Securities transaction statement CSV
     
+    file: raw CSV bytes or a file-like object
+    
+    Results are cached on a BLAKE2 digest of the file bytes; callers always
+    receive their own copies of the DataFrames.
+    """
+    try:
+        data = file if isinstance(file, (bytes, bytearray, memoryview)) else file.read()
+        key = (hashlib.blake2b(data, digest_size=16).digest(), trade_type)
+    except Exception as e:
+        return None, None, f"Error parsing Kotak file: {str(e)}"
+    
+    with _parse_cache_lock:
+        cached = _parse_cache.get(key)
+        if cached is not None:
+            _parse_cache.move_to_end(key)
+    
+    if cached is not None:
+        trades, attention_required, error = cached
+    else:
+        trades, attention_required, error = _parse_kotak_data(data, trade_type)
+        if error is None:
+            with _parse_cache_lock:
+                _parse_cache[key] = (trades, attention_required, error)
+                if len(_parse_cache) > PARSE_CACHE_SIZE:
+                    _parse_cache.popitem(last=False)
+    
+    if error is not None:
+        return None, None, error
+    attention_required = attention_required.copy(deep=True)
+    # Nested per-symbol fill frames aren't covered by a deep copy
+    attention_required['trades'] = [fills.copy() for fills in attention_required['trades']]
+    return trades.copy(deep=True), attention_required, None
+
+
+def _parse_kotak_data(data, trade_type):
+    """
+    Uncached read + parse of raw statement bytes
+    
     FIXES:
     - Includes STT/CTT in total charges
     - Detects and excludes unmatched quantity trades
     - Returns attention_required_df separately
     """
     try:
-        # Read CSV with BOM handling
-        df = pd.read_csv(file, encoding='utf-8-sig')
-        
+        # Read CSV (PyArrow when available, BOM handled either way) - only the columns used below
+        df = csv_reader.read_csv(data, columns=KOTAK_COLUMNS)
+    except Exception as e:
+        return None, None, f"Error parsing Kotak file: {str(e)}"
+    
+    return parse_kotak_df(df, trade_type)
+
+
+def parse_kotak_df(df, trade_type='equity'):
+    """
+    Parse an already-loaded Kotak statement (raw CSV columns)
+    
+    df is modified in place with the standardized columns.
+    
+    Returns:
+        tuple: (trades_df, attention_df, error_message)
+    """
+    try:
         # Validate format
         required_cols = ['Trade Date', 'Transaction Type', 'Quantity', 'Market Rate']
         if not all(col in df.columns for col in required_cols):
             return None, None, "Invalid Kotak format. Missing required columns."
         
-        # Parse dates and times
-        df['trade_datetime'] = pd.to_datetime(
-            df['Trade Date'] + ' ' + df['Trade Time'], 
-            format='%d/%m/%Y %H:%M:%S',
-            errors='coerce'
-        )
-        df['order_datetime'] = pd.to_datetime(
-            df['Trade Date'] + ' ' + df['Order Time'], 
-            format='%d/%m/%Y %H:%M:%S',
-            errors='coerce'
-        )
-        df['trade_date_only'] = pd.to_datetime(df['Trade Date'], format='%d/%m/%Y', errors='coerce').dt.date
+        # Parse each distinct date once; times are added as whole seconds
+        date_codes, date_uniques = pd.factorize(df['Trade Date'])
+        unique_dates = pd.to_datetime(pd.Index(date_uniques), format='%d/%m/%Y', errors='coerce')
+        date_values = np.append(unique_dates.to_numpy(dtype='datetime64[s]'), np.datetime64('NaT'))[date_codes]
+        df['trade_datetime'] = date_values + _clock_seconds(df['Trade Time'])
+        df['order_datetime'] = date_values + _clock_seconds(df['Order Time'])
+        df['trade_date_only'] = np.append(unique_dates.date, None)[date_codes]
         
         # Standardize columns
         df['broker'] = 'Kotak Securities'
-        df['stock_symbol'] = df['Security Name'].str.strip()
-        df['action'] = df['Transaction Type'].str.capitalize()
+        # Categoricals: groupby and the Buy/Sell compares work on integer codes
+        df['stock_symbol'] = _clean_categorical(df['Security Name'], str.strip)
+        df['action'] = _clean_categorical(df['Transaction Type'], str.capitalize, categories=['Buy', 'Sell'])
         df['qty'] = df['Quantity'].astype(float)
         df['trade_price'] = df['Market Rate'].astype(float)
         df['trade_value'] = df['Total'].astype(float)
@@ -57,7 +130,7 @@ def parse_kotak(file, trade_type='equity'):
         # Recalculate total charges including STT
         df['total_charges'] = df['brokerage'] + df['gst'] + df['stt_ctt'] + df['misc_charges']
         
-        df['exchange'] = df['Exchange'].str.strip()
+        df['exchange'] = _clean_categorical(df['Exchange'], str.strip)
         df['trade_category'] = trade_type
         
         # FIXED: Advanced reconstruction with quantity mismatch detection
@@ -77,153 +150,179 @@ def reconstruct_trades_with_validation(df, trade_type):
     - trades_df: Only fully matched trades
     - attention_df: Unmatched trades needing user review
     """
-    trades = []
-    attention_required = []
+    trades = {}
     
     # Sort chronologically
     df = df.sort_values('trade_datetime')
     
-    # Check quantity match per symbol FIRST
-    symbol_qty_check = {}
-    for symbol, group in df.groupby('stock_symbol'):
-        buy_qty = group[group['action'] == 'Buy']['qty'].sum()
-        sell_qty = group[group['action'] == 'Sell']['qty'].sum()
-        
-        symbol_qty_check[symbol] = {
-            'buy_qty': buy_qty,
-            'sell_qty': sell_qty,
-            'matched': buy_qty == sell_qty,
-            'difference': buy_qty - sell_qty
-        }
-    
-    # Process only matched symbols
-    for symbol, group in df.groupby('stock_symbol'):
-        
-        if not symbol_qty_check[symbol]['matched']:
-            # Add to attention required
-            attention_required.append({
-                'symbol': symbol,
-                'reason': 'Quantity Mismatch',
-                'buy_qty': symbol_qty_check[symbol]['buy_qty'],
-                'sell_qty': symbol_qty_check[symbol]['sell_qty'],
-                'difference': symbol_qty_check[symbol]['difference'],
-                'status': 'LONG' if symbol_qty_check[symbol]['difference'] > 0 else 'SHORT',
-                'message': f"Buy qty ({symbol_qty_check[symbol]['buy_qty']}) != Sell qty ({symbol_qty_check[symbol]['sell_qty']}). Possible carry-forward or missing data.",
-                'trades': group[['Trade Date', 'Trade Time', 'Transaction Type', 'Quantity', 'Market Rate']].to_dict('records')
-            })
-            continue
-        
-        # Process matched symbol with FIFO
-        position_queue = deque()
+    # Header-only statement: nothing to validate or pair
+    if df.empty:
+        return pd.DataFrame(columns=TRADE_COLUMNS), pd.DataFrame(columns=ATTENTION_COLUMNS)
+    
+    # Check quantity match per symbol FIRST - buy and sell totals in one grouped pass
+    sums = (
+        df.groupby(['stock_symbol', 'action'], observed=True)['qty'].sum()
+        .unstack(fill_value=0.0)
+        .reindex(columns=['Buy', 'Sell'], fill_value=0.0)
+    )
+    matched = sums['Buy'].eq(sums['Sell'])
+    
+    # Attention records for mismatched symbols
+    mismatched = sums[~matched]
+    buy_qty = mismatched['Buy'].to_numpy()
+    sell_qty = mismatched['Sell'].to_numpy()
+    difference = buy_qty - sell_qty
+    
+    # Raw fills per symbol stay frames (row slices), not boxed record dicts;
+    # to_dict('records') only if a consumer needs them
+    mismatch_fills = df.loc[
+        df['stock_symbol'].isin(mismatched.index),
+        ['stock_symbol', 'Trade Date', 'Trade Time', 'Transaction Type', 'Quantity', 'Market Rate']
+    ]
+    fill_positions = mismatch_fills.groupby('stock_symbol', observed=True).indices
+    mismatch_fills = mismatch_fills.drop(columns='stock_symbol')
+    
+    attention_df = pd.DataFrame({
+        'symbol': mismatched.index.to_numpy(),
+        'reason': 'Quantity Mismatch',
+        'buy_qty': buy_qty,
+        'sell_qty': sell_qty,
+        'difference': difference,
+        'status': np.where(difference > 0, 'LONG', 'SHORT'),
+        'message': [
+            f"Buy qty ({b}) != Sell qty ({s}). Possible carry-forward or missing data."
+            for b, s in zip(buy_qty.tolist(), sell_qty.tolist())
+        ],
+        'trades': [mismatch_fills.take(fill_positions[symbol]) for symbol in mismatched.index]
+    }) if len(mismatched) else pd.DataFrame(columns=ATTENTION_COLUMNS)
+    
+    # Process only matched symbols with FIFO
+    fifo_df = df[df['stock_symbol'].isin(matched.index[matched]) & df['action'].isin(['Buy', 'Sell'])]
+    
+    if len(fifo_df) > 0:
+        # One contiguous pass: rows grouped by symbol (sorted), chronological within
+        symbol_ids, _ = pd.factorize(fifo_df['stock_symbol'], sort=True)
+        order = np.argsort(symbol_ids, kind='stable')
+        fifo_df = fifo_df.iloc[order]
+        symbol_ids = symbol_ids[order].astype(np.int64)
+        is_buy = (fifo_df['action'] == 'Buy').to_numpy()
         
-        for idx, row in group.iterrows():
-            
-            if row['action'] == 'Buy':
-                if position_queue and position_queue[0]['type'] == 'short':
-                    # Close short
-                    short_entry = position_queue.popleft()
-                    trade = create_trade_record(
-                        entry=short_entry,
-                        exit_row=row,
-                        symbol=symbol,
-                        direction='SHORT',
-                        trade_category=trade_type
-                    )
-                    trades.append(trade)
-                else:
-                    # Open long
-                    position_queue.append({
-                        'type': 'long',
-                        'qty': row['qty'],
-                        'price': row['trade_price'],
-                        'time': row['trade_datetime'],
-                        'order_time': row['order_datetime'],
-                        'charges': row['total_charges'],
-                        'brokerage': row['brokerage'],
-                        'stt': row['stt_ctt'],
-                        'gst': row['gst'],
-                        'misc': row['misc_charges'],
-                        'exchange': row['exchange']
-                    })
-            
-            elif row['action'] == 'Sell':
-                if position_queue and position_queue[0]['type'] == 'long':
-                    # Close long
-                    long_entry = position_queue.popleft()
-                    trade = create_trade_record(
-                        entry=long_entry,
-                        exit_row=row,
-                        symbol=symbol,
-                        direction='LONG',
-                        trade_category=trade_type
-                    )
-                    trades.append(trade)
-                else:
-                    # Open short
-                    position_queue.append({
-                        'type': 'short',
-                        'qty': row['qty'],
-                        'price': row['trade_price'],
-                        'time': row['trade_datetime'],
-                        'order_time': row['order_datetime'],
-                        'charges': row['total_charges'],
-                        'brokerage': row['brokerage'],
-                        'stt': row['stt_ctt'],
-                        'gst': row['gst'],
-                        'misc': row['misc_charges'],
-                        'exchange': row['exchange']
-                    })
-    
-    trades_df = pd.DataFrame(trades) if trades else pd.DataFrame()
-    attention_df = pd.DataFrame(attention_required) if attention_required else pd.DataFrame()
+        entry_idx, exit_idx = _fifo_pair(symbol_ids, is_buy)
+        trades = _trade_columns(fifo_df, entry_idx, exit_idx, is_buy[entry_idx], trade_type)
+    
+    trades_df = pd.DataFrame(trades).round({col: 2 for col in MONEY_COLUMNS}) if trades else pd.DataFrame(columns=TRADE_COLUMNS)
     
     return trades_df, attention_df
 
 
-def create_trade_record(entry, exit_row, symbol, direction, trade_category):
-    """Create trade record with all charges including STT"""
+def _trade_columns(fills, entry_idx, exit_idx, entry_is_buy, trade_category):
+    """
+    Trade-record columns for each (entry, exit) fill pair
     
-    entry_time = entry['time']
-    exit_time = exit_row['trade_datetime']
+    Every field is a column expression over the paired fills, charges
+    including STT. Money fields are left unrounded.
     
-    # Calculate holding period
-    if pd.notna(entry_time) and pd.notna(exit_time):
-        holding_minutes = int((exit_time - entry_time).total_seconds() / 60)
-    else:
-        holding_minutes = 0
+    Returns:
+        dict: output column -> array, one element per trade
+    """
+    entry = fills.iloc[entry_idx].reset_index(drop=True)
+    exit_ = fills.iloc[exit_idx].reset_index(drop=True)
     
-    # P&L calculation
-    if direction == 'LONG':
-        gross_pnl = (exit_row['trade_price'] - entry['price']) * entry['qty']
-    else:  # SHORT
-        gross_pnl = (entry['price'] - exit_row['trade_price']) * entry['qty']
+    entry_time = entry['trade_datetime']
+    exit_time = exit_['trade_datetime']
     
-    # Total charges (now includes STT)
-    total_charges = entry['charges'] + exit_row['total_charges']
-    net_pnl = gross_pnl - total_charges
+    # Holding period (0 when either timestamp is missing)
+    holding_minutes = ((exit_time - entry_time).dt.total_seconds() // 60).fillna(0).astype(np.int64)
     
-    # Trade type
-    trade_type = 'Intraday' if holding_minutes < 1440 else 'Delivery'
+    # P&L calculation - LONG profits when exit > entry, SHORT the other way
+    sign = np.where(entry_is_buy, 1.0, -1.0)
+    gross_pnl = (exit_['trade_price'] - entry['trade_price']) * entry['qty'] * sign
+    
+    # Total charges (now includes STT)
+    total_charges = entry['total_charges'] + exit_['total_charges']
     
     return {
         'broker': 'Kotak Securities',
-        'symbol': symbol,
-        'direction': direction,
-        'entry_date': entry_time.date() if pd.notna(entry_time) else None,
+        'symbol': entry['stock_symbol'],
+        'direction': np.where(entry_is_buy, 'LONG', 'SHORT'),
+        'entry_date': entry_time.dt.date,
         'entry_time': entry_time,
-        'exit_time': exit_time if pd.notna(exit_time) else None,
+        'exit_time': exit_time,
         'quantity': entry['qty'],
-        'entry_price': round(entry['price'], 2),
-        'exit_price': round(exit_row['trade_price'], 2),
-        'gross_pnl': round(gross_pnl, 2),
-        'brokerage': round(entry['brokerage'] + exit_row['brokerage'], 2),
-        'stt': round(entry['stt'] + exit_row['stt_ctt'], 2),
-        'gst': round(entry['gst'] + exit_row['gst'], 2),
-        'misc_charges': round(entry['misc'] + exit_row['misc_charges'], 2),
-        'total_charges': round(total_charges, 2),
-        'net_pnl': round(net_pnl, 2),
+        'entry_price': entry['trade_price'],
+        'exit_price': exit_['trade_price'],
+        'gross_pnl': gross_pnl,
+        'brokerage': entry['brokerage'] + exit_['brokerage'],
+        'stt': entry['stt_ctt'] + exit_['stt_ctt'],
+        'gst': entry['gst'] + exit_['gst'],
+        'misc_charges': entry['misc_charges'] + exit_['misc_charges'],
+        'total_charges': total_charges,
+        'net_pnl': gross_pnl - total_charges,
         'holding_period_minutes': holding_minutes,
-        'trade_type': trade_type,
+        'trade_type': np.where(holding_minutes < 1440, 'Intraday', 'Delivery'),
         'trade_category': trade_category,
         'exchange': entry['exchange']
-    }
\ No newline at end of file
+    }
+
+
+def _clean_categorical(col, clean, categories=None):
+    """
+    Categorical of clean(value) for a low-cardinality text column
+    
+    clean runs in a plain loop over the distinct values only, not through
+    the .str accessor over every row; missing values stay missing.
+    categories: fixed category list (values outside it become missing);
+    defaults to the sorted cleaned values.
+    """
+    codes, uniques = pd.factorize(col)
+    cleaned = np.array([clean(v) for v in uniques], dtype=object)
+    
+    if categories is None:
+        categories, inverse = np.unique(cleaned, return_inverse=True)
+    else:
+        inverse = pd.Index(categories).get_indexer(cleaned)
+    
+    # Trailing -1 maps factorize's missing-value code (-1) to a missing category code
+    return pd.Categorical.from_codes(np.append(inverse, -1)[codes], categories=categories)
+
+
+def _clock_seconds(times):
+    """
+    'HH:MM:SS' strings as timedelta64[s] since midnight
+    
+    Parsed with the same '%H:%M:%S' rules as a full timestamp (so '9:15:00'
+    is valid), one parse per distinct string - fills of one order share a
+    time. Anything that isn't a valid clock time becomes NaT.
+    """
+    codes, uniques = pd.factorize(times)
+    clock = pd.to_datetime(pd.Index(uniques), format='%H:%M:%S', errors='coerce')
+    total = (clock - pd.Timestamp(1900, 1, 1)).to_numpy(dtype='timedelta64[s]')
+    # Trailing NaT is where factorize's missing-value code (-1) lands
+    return np.append(total, np.timedelta64('NaT', 's'))[codes]
+
+
+def _fifo_pair(symbol_ids, is_buy):
+    """
+    FIFO-pair fills sorted by (symbol, time)
+    
+    Within a symbol the open queue only ever holds one side, and both sides
+    are consumed in time order - so FIFO closes the k-th buy against the
+    k-th sell. Pairing is a merge on (symbol, rank within side); the earlier
+    fill of each pair is the entry.
+    
+    Returns:
+        tuple: (entry_idx, exit_idx) row positions of each closed trade, in exit order
+    """
+    fills = pd.DataFrame({'symbol': symbol_ids, 'is_buy': is_buy, 'pos': np.arange(len(symbol_ids))})
+    fills['rank'] = fills.groupby(['symbol', 'is_buy'], sort=False).cumcount()
+    
+    pairs = fills[fills['is_buy']].merge(
+        fills[~fills['is_buy']], on=['symbol', 'rank'], suffixes=('_buy', '_sell')
+    )
+    buy_pos = pairs['pos_buy'].to_numpy()
+    sell_pos = pairs['pos_sell'].to_numpy()
+    
+    entry_idx = np.minimum(buy_pos, sell_pos)
+    exit_idx = np.maximum(buy_pos, sell_pos)
+    order = np.argsort(exit_idx, kind='stable')
+    return entry_idx[order], exit_idx[order]
@@ -0,0 +1,78 @@
+"""
+CSV Reader - Fast tradebook ingest
+Uses PyArrow's multi-threaded CSV reader when installed, pandas otherwise
+"""
+
+import csv
+import io
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+# Bytes scanned for the header row (far longer than any tradebook header)
+HEADER_PEEK_BYTES = 64 * 1024
+
+# Explicit types for known tradebook columns: no inference, no astype afterwards
+TEXT_COLUMNS = ['Trade Date', 'Trade Time', 'Order Time', 'Security Name', 'Transaction Type', 'Exchange']
+NUMERIC_COLUMNS = ['Quantity', 'Market Rate', 'Total', 'Brokerage', 'GST', 'STT/CTT', 'Misc.']
+
+
+def header_columns(data):
+    """
+    Column names from the first line of raw CSV bytes (BOM stripped)
+    
+    data may also be a seekable binary file; only the header is read and the
+    position is restored.
+    """
+    if not isinstance(data, (bytes, bytearray, memoryview)):
+        start = data.tell()
+        head = data.read(HEADER_PEEK_BYTES)
+        data.seek(start)
+        data = head
+    first_line = bytes(data[:HEADER_PEEK_BYTES]).split(b'\n', 1)[0]
+    return next(csv.reader([first_line.decode('utf-8-sig', errors='replace')]), [])
+
+
+def read_csv(source, columns=None):
+    """
+    Read a tradebook CSV into a pandas DataFrame
+    
+    source: raw CSV bytes (parsed without a file wrapper) or a file-like object.
+    columns: optional subset to convert; names missing from the file are
+    skipped. PyArrow is used when available; downstream code always
+    receives pandas.
+    """
+    if not isinstance(source, (bytes, bytearray, memoryview)):
+        source = source.read()
+    
+    if columns is not None:
+        wanted = set(columns)
+        columns = [col for col in header_columns(source) if col in wanted]
+    
+    if PYARROW_AVAILABLE:
+        convert_options = pacsv.ConvertOptions(
+            include_columns=columns or [],
+            column_types={
+                **{col: pa.string() for col in TEXT_COLUMNS},
+                **{col: pa.float64() for col in NUMERIC_COLUMNS},
+            },
+            strings_can_be_null=True,  # empty cells -> NaN, as with pandas
+        )
+        table = pacsv.read_csv(pa.BufferReader(source), convert_options=convert_options)
+        return table.to_pandas(split_blocks=True, self_destruct=True)
+    
+    return pd.read_csv(
+        io.BytesIO(source),
+        encoding='utf-8-sig',
+        usecols=(lambda col: col in wanted) if columns is not None else None,
+        dtype={
+            **{col: str for col in TEXT_COLUMNS},
+            **{col: 'float64' for col in NUMERIC_COLUMNS},
+        },
+    )
@@ -0,0 +1,34 @@
+"""Regression checks for the Kotak statement parser"""
+
+import pandas as pd
+
+from modules.parsers import kotak_parser
+
+HEADER = "Trade Date,Trade Time,Order Time,Security Name,Transaction Type,Exchange,Quantity,Market Rate,Total,Brokerage,GST,STT/CTT,Misc.\n"
+
+
+def test_times_without_leading_zero():
+    """'9:15:00' parses like '09:15:00' - FIFO order and holding period stay intact"""
+    data = (
+        HEADER
+        + "01/02/2024,9:15:00,9:14:59,INFY,BUY,NSE,10,100,1000,1,0.5,1,0.1\n"
+        + "01/02/2024,10:15:00,10:14:59,INFY,SELL,NSE,10,110,1100,1,0.5,1,0.1\n"
+    ).encode()
+    
+    trades, attention, error = kotak_parser.parse_kotak(data)
+    
+    assert error is None
+    assert len(attention) == 0
+    assert len(trades) == 1
+    trade = trades.iloc[0]
+    assert trade['entry_time'] == pd.Timestamp('2024-02-01 09:15:00')
+    assert trade['direction'] == 'LONG'
+    assert trade['holding_period_minutes'] == 60
+
+
+def test_clock_seconds_rejects_malformed_times():
+    """Fractional, out-of-range and missing times become NaT rather than being truncated"""
+    seconds = kotak_parser._clock_seconds(pd.Series(['9:15:00', '10:15:00.5', '25:00:00', None]))
+    
+    assert seconds[0] == 9 * 3600 + 15 * 60
+    assert pd.isna(seconds[1:]).all()